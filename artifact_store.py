@@ -0,0 +1,206 @@
+import logging
+import os
+import threading
+import time
+
+import sqlite_db
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactStore:
+    """
+    Files the app keeps on local disk (uploaded PDFs, converted DOCX files), tracked in a SQLite index.
+    - Each artifact lives in one of the configured folders ("kind" -> directory) and has a row recording
+      its size, creation time, last access, original filename and an optional content key
+      (e.g. the hash of the input it was derived from) that find() can look it up by.
+    - A background sweeper removes artifacts idle for longer than ttl_seconds, then evicts the least
+      recently used ones until the total size fits in max_bytes. Pinned artifacts (inputs of conversions
+      still in progress) are exempt from quota eviction but not from the TTL.
+    - Files found on disk without a row (e.g. from before the index existed) are adopted on start-up;
+      rows whose file has disappeared are dropped.
+    The index is shared by every worker process using the same db_path.
+    """
+
+    def __init__(self, folders, db_path, max_bytes=1024 ** 3, ttl_seconds=24 * 3600, sweep_interval=300):
+        self.folders = dict(folders)
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._sweeper_pid = None
+        self._stats = {"expired": 0, "evicted": 0, "deleted": 0}
+
+        for folder in self.folders.values():
+            os.makedirs(folder, exist_ok=True)
+        self._init_db()
+        self.reconcile()
+
+    def _connect(self):
+        return sqlite_db.connect(self.db_path)
+
+    def _init_db(self):
+        with sqlite_db.init_db(self.db_path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                " kind TEXT NOT NULL, name TEXT NOT NULL, size INTEGER NOT NULL,"
+                " original_name TEXT, created_at REAL NOT NULL, accessed_at REAL NOT NULL,"
+                " pinned INTEGER NOT NULL DEFAULT 0, content_key TEXT, PRIMARY KEY (kind, name))"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(artifacts)")}
+            if "content_key" not in columns:  # Index created before content keys existed
+                conn.execute("ALTER TABLE artifacts ADD COLUMN content_key TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_accessed ON artifacts (accessed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_content ON artifacts (kind, content_key)")
+
+    def path(self, kind, name):
+        """Filesystem path for an artifact name (which must already be a secure, flat filename)."""
+        return os.path.join(self.folders[kind], name)
+
+    def _remove_file(self, kind, name):
+        try:
+            os.remove(self.path(kind, name))
+        except FileNotFoundError:
+            pass
+        except OSError as e_remove:
+            logger.error(f"Could not remove artifact {kind}/{name}: {e_remove}")
+
+    # --- Public API ---
+    def register(self, kind, name, original_name=None, pinned=False, content_key=None):
+        """Record a file that has just been written to path(kind, name). Returns its size."""
+        size = os.path.getsize(self.path(kind, name))
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO artifacts"
+                " (kind, name, size, original_name, created_at, accessed_at, pinned, content_key)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, name, size, original_name, now, now, int(pinned), content_key),
+            )
+        self.start_sweeper()
+        return size
+
+    def unpin(self, kind, name):
+        with self._connect() as conn:
+            conn.execute("UPDATE artifacts SET pinned = 0 WHERE kind = ? AND name = ?", (kind, name))
+
+    def lookup(self, kind, name, touch=True):
+        """
+        Return {"name", "path", "size", "original_name", "created_at"} for an indexed artifact, or None.
+        touch=True marks it as accessed for LRU eviction. A row whose file has vanished is dropped.
+        """
+        self.start_sweeper()
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT size, original_name, created_at FROM artifacts WHERE kind = ? AND name = ?", (kind, name)
+            ).fetchone()
+            if row is None:
+                return None
+            path = self.path(kind, name)
+            if not os.path.isfile(path):
+                conn.execute("DELETE FROM artifacts WHERE kind = ? AND name = ?", (kind, name))
+                return None
+            if touch:
+                conn.execute("UPDATE artifacts SET accessed_at = ? WHERE kind = ? AND name = ?", (now, kind, name))
+        size, original_name, created_at = row
+        return {"name": name, "path": path, "size": size, "original_name": original_name, "created_at": created_at}
+
+    def find(self, kind, content_key, touch=True):
+        """Like lookup(), for the newest artifact of this kind registered with content_key."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT name FROM artifacts WHERE kind = ? AND content_key = ? ORDER BY created_at DESC LIMIT 1",
+                (kind, content_key),
+            ).fetchone()
+        return self.lookup(kind, row[0], touch) if row is not None else None
+
+    def delete(self, kind, name):
+        """Remove an artifact's file and index row."""
+        self._remove_file(kind, name)
+        with self._connect() as conn:
+            conn.execute("DELETE FROM artifacts WHERE kind = ? AND name = ?", (kind, name))
+        with self._lock:
+            self._stats["deleted"] += 1
+
+    def reconcile(self):
+        """Adopt unindexed files (aged by mtime) and drop rows whose file is missing."""
+        with self._connect() as conn:
+            indexed = set(conn.execute("SELECT kind, name FROM artifacts").fetchall())
+            for kind, folder in self.folders.items():
+                for entry in os.scandir(folder):
+                    if not entry.is_file() or (kind, entry.name) in indexed:
+                        continue
+                    stat = entry.stat()
+                    conn.execute(
+                        "INSERT OR IGNORE INTO artifacts (kind, name, size, original_name, created_at, accessed_at)"
+                        " VALUES (?, ?, ?, NULL, ?, ?)",
+                        (kind, entry.name, stat.st_size, stat.st_mtime, stat.st_mtime),
+                    )
+            missing = [(kind, name) for kind, name in indexed
+                       if kind not in self.folders or not os.path.isfile(self.path(kind, name))]
+            conn.executemany("DELETE FROM artifacts WHERE kind = ? AND name = ?", missing)
+
+    def sweep(self):
+        """One eviction pass: TTL first, then LRU down to max_bytes. Returns the number of files removed."""
+        now = time.time()
+        with self._connect() as conn:
+            expired = conn.execute(
+                "SELECT kind, name FROM artifacts WHERE accessed_at < ?", (now - self.ttl_seconds,)
+            ).fetchall()
+            conn.executemany("DELETE FROM artifacts WHERE kind = ? AND name = ?", expired)
+
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+            evicted = []
+            if total > self.max_bytes:
+                for kind, name, size in conn.execute(
+                    "SELECT kind, name, size FROM artifacts WHERE pinned = 0 ORDER BY accessed_at"
+                ).fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    evicted.append((kind, name))
+                    total -= size
+                conn.executemany("DELETE FROM artifacts WHERE kind = ? AND name = ?", evicted)
+
+        # Rows go first so a concurrent download sees "not found" rather than a half-deleted file.
+        for kind, name in expired + evicted:
+            if kind in self.folders:
+                self._remove_file(kind, name)
+        with self._lock:
+            self._stats["expired"] += len(expired)
+            self._stats["evicted"] += len(evicted)
+        if expired or evicted:
+            logger.info(f"Artifact sweep removed {len(expired)} expired and {len(evicted)} over-quota files.")
+        return len(expired) + len(evicted)
+
+    def _sweep_forever(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e_sweep:
+                logger.error(f"Artifact sweep failed: {e_sweep}")
+            time.sleep(self.sweep_interval)
+
+    def start_sweeper(self):
+        """Start the background sweeper thread in this process (idempotent; re-started after a fork)."""
+        with self._lock:
+            if self._sweeper is not None and self._sweeper_pid == os.getpid():
+                return
+            self._sweeper = threading.Thread(target=self._sweep_forever, name="artifact-sweeper", daemon=True)
+            self._sweeper_pid = os.getpid()
+            self._sweeper.start()
+
+    def stats(self):
+        """Current file count and bytes per kind, plus removal counters for this process."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT kind, COUNT(*), COALESCE(SUM(size), 0) FROM artifacts GROUP BY kind").fetchall()
+        with self._lock:
+            snapshot = dict(self._stats)
+        snapshot["files"] = {kind: count for kind, count, _ in rows}
+        snapshot["bytes"] = {kind: size for kind, _, size in rows}
+        snapshot["total_bytes"] = sum(snapshot["bytes"].values())
+        snapshot["max_bytes"] = self.max_bytes
+        return snapshot
@@ -0,0 +1,75 @@
+"""
+Compare two run_bench.py result files and flag regressions.
+
+An endpoint or stage regresses when its p50 or p95 grows by more than --threshold
+(relative), or its throughput drops by more than --threshold.
+
+Usage:
+    python bench/compare.py bench/results/before.json bench/results/after.json --threshold 0.15
+Exits with status 1 if any regression is found.
+"""
+import argparse
+import json
+import sys
+
+LATENCY_KEYS = ("p50_ms", "p95_ms")
+
+
+def _relative_change(old, new):
+    if old in (None, 0) or new is None:
+        return None
+    return (new - old) / old
+
+
+def compare_entries(name, old, new, threshold):
+    """Return (lines, regressed) for one endpoint/stage present in both runs."""
+    lines, regressed = [], False
+    for key in LATENCY_KEYS:
+        change = _relative_change(old.get(key), new.get(key))
+        if change is None:
+            continue
+        flag = "REGRESSION" if change > threshold else ("improved" if change < -threshold else "")
+        regressed = regressed or change > threshold
+        lines.append(f"  {name:<40}{key:>10}{old[key]:>12.2f}{new[key]:>12.2f}{change:>+9.1%}  {flag}")
+    change = _relative_change(old.get("throughput_rps"), new.get("throughput_rps"))
+    if change is not None:
+        flag = "REGRESSION" if change < -threshold else ("improved" if change > threshold else "")
+        regressed = regressed or change < -threshold
+        lines.append(f"  {name:<40}{'req/s':>10}{old['throughput_rps']:>12.2f}{new['throughput_rps']:>12.2f}{change:>+9.1%}  {flag}")
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change treated as significant")
+    args = parser.parse_args()
+
+    with open(args.before, "r", encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, "r", encoding="utf-8") as f:
+        after = json.load(f)
+
+    print(f"before: {before['meta'].get('git_revision')}  after: {after['meta'].get('git_revision')}")
+    print(f"  {'name':<40}{'metric':>10}{'before':>12}{'after':>12}{'change':>9}")
+    any_regression = False
+
+    for name in sorted(set(before.get("stages", {})) & set(after.get("stages", {}))):
+        lines, regressed = compare_entries(f"stage {name}", before["stages"][name], after["stages"][name], args.threshold)
+        print("\n".join(lines))
+        any_regression = any_regression or regressed
+
+    for label in sorted(set(before.get("configs", {})) & set(after.get("configs", {}))):
+        old_endpoints = before["configs"][label]["endpoints"]
+        new_endpoints = after["configs"][label]["endpoints"]
+        for name in sorted(set(old_endpoints) & set(new_endpoints)):
+            lines, regressed = compare_entries(f"{label} {name}", old_endpoints[name], new_endpoints[name], args.threshold)
+            print("\n".join(lines))
+            any_regression = any_regression or regressed
+
+    return 1 if any_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
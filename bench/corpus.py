@@ -0,0 +1,92 @@
+"""
+Generate TXT, PDF and DOCX benchmark inputs at several sizes.
+
+Files are written as <size>.<ext> (e.g. large.pdf) into the output directory and
+reused if they already exist. PDFs are built with PyMuPDF, which pdf2docx already
+depends on; DOCX files with python-docx.
+
+Usage:
+    python bench/corpus.py --out /tmp/bench-corpus
+"""
+import argparse
+import os
+import random
+
+# Pages per document; TXT and DOCX get the same amount of text as the PDF of that size.
+SIZES = {"small": 1, "medium": 10, "large": 50}
+PARAGRAPHS_PER_PAGE = 6
+
+_WORDS = (
+    "the council transit plan budget report quarter revenue growth customer market analysis "
+    "data model risk policy review project team schedule cost estimate energy supply network "
+    "service quality result method sample study evidence outcome region district investment"
+).split()
+
+
+def _paragraphs(count, seed):
+    rng = random.Random(seed)
+    paragraphs = []
+    for _ in range(count):
+        sentences = []
+        for _ in range(rng.randint(3, 6)):
+            words = [rng.choice(_WORDS) for _ in range(rng.randint(8, 18))]
+            sentences.append(" ".join(words).capitalize() + ".")
+        paragraphs.append(" ".join(sentences))
+    return paragraphs
+
+
+def write_txt(path, pages, seed=0):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(_paragraphs(pages * PARAGRAPHS_PER_PAGE, seed)))
+
+
+def write_docx(path, pages, seed=0):
+    from docx import Document
+
+    doc = Document()
+    doc.add_heading("Benchmark document", level=1)
+    for paragraph in _paragraphs(pages * PARAGRAPHS_PER_PAGE, seed):
+        doc.add_paragraph(paragraph)
+    doc.save(path)
+
+
+def write_pdf(path, pages, seed=0):
+    import fitz  # PyMuPDF, installed with pdf2docx
+
+    doc = fitz.open()
+    paragraphs = _paragraphs(pages * PARAGRAPHS_PER_PAGE, seed)
+    for page_number in range(pages):
+        page = doc.new_page()
+        chunk = paragraphs[page_number * PARAGRAPHS_PER_PAGE:(page_number + 1) * PARAGRAPHS_PER_PAGE]
+        page.insert_textbox(fitz.Rect(56, 56, page.rect.width - 56, page.rect.height - 56),
+                            "\n\n".join(chunk), fontsize=10)
+    doc.save(path)
+    doc.close()
+
+
+WRITERS = {"txt": write_txt, "pdf": write_pdf, "docx": write_docx}
+
+
+def build_corpus(out_dir, sizes=None, kinds=None):
+    """Create missing corpus files; returns {(kind, size): path}."""
+    os.makedirs(out_dir, exist_ok=True)
+    corpus = {}
+    for size in sizes or SIZES:
+        for kind in kinds or WRITERS:
+            path = os.path.join(out_dir, f"{size}.{kind}")
+            if not os.path.exists(path):
+                WRITERS[kind](path, SIZES[size], seed=SIZES[size])
+            corpus[(kind, size)] = path
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate TXT/PDF/DOCX benchmark corpora.")
+    parser.add_argument("--out", default=os.path.join("bench", "corpus"))
+    args = parser.parse_args()
+    for (kind, size), path in sorted(build_corpus(args.out).items()):
+        print(f"{kind:<5}{size:<8}{os.path.getsize(path) / 1024:>9.1f} KB  {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Serves POST /v1/chat/completions (plain and stream=true) with configurable latency,
+error rate and reply size, so the app can be benchmarked without real API calls.
+Point the app at it with OPENAI_API_BASE=http://127.0.0.1:<port>/v1.
+
+Usage:
+    python bench/fake_openai.py --port 8089 --latency 0.8 --jitter 0.2 --error-rate 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAIConfig:
+    def __init__(self, latency=0.5, jitter=0.0, error_rate=0.0, error_status=429, reply_words=120,
+                 token_interval=0.01, retry_after=1):
+        self.latency = latency  # Seconds before the first byte
+        self.jitter = jitter  # +/- seconds added to latency
+        self.error_rate = error_rate  # Fraction of requests answered with error_status
+        self.error_status = error_status
+        self.reply_words = reply_words
+        self.token_interval = token_interval  # Seconds between streamed chunks
+        self.retry_after = retry_after  # Retry-After header sent with 429s
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+
+def _reply_text(prompt, words):
+    vocabulary = prompt.split()[:200] or ["summary"]
+    return " ".join(vocabulary[i % len(vocabulary)] for i in range(words))
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None  # Set by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        config = self.config
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send_json(400, {"error": {"message": "Invalid JSON", "type": "invalid_request_error"}})
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+        with config.lock:
+            config.requests += 1
+            failing = random.random() < config.error_rate
+            if failing:
+                config.errors += 1
+
+        time.sleep(max(config.latency + random.uniform(-config.jitter, config.jitter), 0))
+
+        if failing:
+            headers = {"Retry-After": str(config.retry_after)} if config.error_status == 429 else None
+            return self._send_json(config.error_status, {
+                "error": {"message": "Simulated failure", "type": "rate_limit_error" if config.error_status == 429 else "server_error"}
+            }, headers)
+
+        prompt = " ".join(m.get("content", "") for m in payload.get("messages", []) if m.get("role") == "user")
+        reply = _reply_text(prompt, config.reply_words)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = payload.get("model", "gpt-3.5-turbo")
+
+        if not payload.get("stream"):
+            return self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": config.reply_words,
+                          "total_tokens": len(prompt) // 4 + config.reply_words},
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_chunk(data):
+            encoded = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(encoded):x}\r\n".encode("ascii") + encoded + b"\r\n")
+            self.wfile.flush()
+
+        try:
+            for index, word in enumerate(reply.split(" ")):
+                delta = {"content": word if index == 0 else " " + word}
+                write_chunk(json.dumps({
+                    "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                }))
+                time.sleep(config.token_interval)
+            write_chunk("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client went away mid-stream
+
+
+def make_server(config, host="127.0.0.1", port=0):
+    """Create (but don't start) a server bound to host:port; port 0 picks a free port."""
+    handler = type("ConfiguredFakeOpenAIHandler", (FakeOpenAIHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(config, host="127.0.0.1", port=0):
+    """Start a server on a daemon thread; returns (server, base_url)."""
+    server = make_server(config, host, port)
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server, f"http://{host}:{server.server_port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server for benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--reply-words", type=int, default=120)
+    parser.add_argument("--token-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    config = FakeOpenAIConfig(args.latency, args.jitter, args.error_rate, args.error_status,
+                              args.reply_words, args.token_interval)
+    server = make_server(config, args.host, args.port)
+    print(f"Fake OpenAI API listening on http://{args.host}:{server.server_port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
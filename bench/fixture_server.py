@@ -0,0 +1,76 @@
+"""
+Local HTTP server for the saved HTML pages in bench/fixtures/html.
+
+Serves GET /<fixture name>, optionally with added latency and with each page body
+repeated --scale times, so /summarize_webpage can be benchmarked offline.
+
+Usage:
+    python bench/fixture_server.py --port 8090 --latency 0.05 --scale 20
+"""
+import argparse
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from html_parity import DEFAULT_FIXTURES, load_fixtures
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    pages = {}  # Set by make_server: name -> encoded body
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        name = self.path.lstrip("/").split("?", 1)[0]
+        body = self.pages.get(name)
+        time.sleep(self.latency)
+        if body is None:
+            body = b"<html><body><p>Not found</p></body></html>"
+            self.send_response(404)
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def make_server(fixtures_dir=DEFAULT_FIXTURES, scale=1, latency=0.0, host="127.0.0.1", port=0):
+    pages = {name: html.encode("utf-8") for name, html in load_fixtures(fixtures_dir, scale).items()}
+    handler = type("ConfiguredFixtureHandler", (FixtureHandler,), {"pages": pages, "latency": latency})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(fixtures_dir=DEFAULT_FIXTURES, scale=1, latency=0.0, host="127.0.0.1", port=0):
+    """Start a server on a daemon thread; returns (server, base_url, fixture_names)."""
+    server = make_server(fixtures_dir, scale, latency, host, port)
+    threading.Thread(target=server.serve_forever, name="fixture-server", daemon=True).start()
+    return server, f"http://{host}:{server.server_port}", sorted(server.RequestHandlerClass.pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve saved HTML fixtures for webpage benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = make_server(args.fixtures, args.scale, args.latency, args.host, args.port)
+    print(f"Serving {len(server.RequestHandlerClass.pages)} fixtures from {os.path.abspath(args.fixtures)} "
+          f"on http://{args.host}:{server.server_port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Parity and latency harness for the HTML extraction backends.
+
+Runs every available backend over a corpus of saved HTML pages and compares each
+result with the bs4 reference implementation, plus the median/p95 extraction time.
+
+Usage (from the repository root):
+    python bench/html_parity.py
+    python bench/html_parity.py --fixtures path/to/html --repeat 50 --scale 20 --json parity.json
+
+--scale N repeats each page body N times to approximate heavy news pages.
+With --strict, exits with status 1 if any backend output differs from the reference.
+"""
+import argparse
+import difflib
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_extraction import BACKENDS, available_backends  # noqa: E402
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "html")
+REFERENCE_BACKEND = "bs4"
+
+
+def load_fixtures(directory, scale):
+    fixtures = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith((".html", ".htm")):
+            continue
+        with open(os.path.join(directory, name), "r", encoding="utf-8", errors="replace") as f:
+            html = f.read()
+        if scale > 1 and "<body" in html.lower():
+            # Repeat the inside of <body> so the page grows but keeps its structure.
+            lower = html.lower()
+            start = lower.index(">", lower.index("<body")) + 1
+            end = lower.rfind("</body>")
+            end = end if end != -1 else len(html)
+            html = html[:start] + html[start:end] * scale + html[end:]
+        fixtures[name] = html
+    return fixtures
+
+
+def time_backend(extract, html, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = extract(html)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return result, {
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+    }
+
+
+def run(fixtures, backends, repeat):
+    report = {"backends": backends, "repeat": repeat, "fixtures": {}}
+    for name, html in fixtures.items():
+        reference, _ = time_backend(BACKENDS[REFERENCE_BACKEND][0], html, 1)
+        entry = {"bytes": len(html.encode("utf-8")), "reference_chars": len(reference), "results": {}}
+        for backend in backends:
+            output, timing = time_backend(BACKENDS[backend][0], html, repeat)
+            entry["results"][backend] = dict(
+                timing,
+                identical=output == reference,
+                similarity=round(difflib.SequenceMatcher(None, reference.split(), output.split()).ratio(), 4),
+                chars=len(output),
+            )
+        report["fixtures"][name] = entry
+    return report
+
+
+def print_report(report):
+    backends = report["backends"]
+    header = f"{'fixture':<28}{'KB':>7}" + "".join(f"{b + ' ms':>16}{'parity':>9}" for b in backends)
+    print(header)
+    print("-" * len(header))
+    totals = {b: 0.0 for b in backends}
+    for name, entry in report["fixtures"].items():
+        row = f"{name[:27]:<28}{entry['bytes'] / 1024:>7.1f}"
+        for backend in backends:
+            result = entry["results"][backend]
+            totals[backend] += result["median_ms"]
+            parity = "ok" if result["identical"] else f"{result['similarity']:.2f}"
+            row += f"{result['median_ms']:>16.3f}{parity:>9}"
+        print(row)
+    print("-" * len(header))
+    baseline = totals.get(REFERENCE_BACKEND) or 0
+    summary = f"{'total (median)':<35}"
+    for backend in backends:
+        speedup = f"x{baseline / totals[backend]:.1f}" if baseline and totals[backend] else ""
+        summary += f"{totals[backend]:>16.3f}{speedup:>9}"
+    print(summary)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare HTML extraction backends for output parity and latency.")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="Directory of saved .html pages")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per backend and fixture")
+    parser.add_argument("--scale", type=int, default=1, help="Repeat each page body N times")
+    parser.add_argument("--backend", action="append", help="Limit to these backends (repeatable)")
+    parser.add_argument("--json", help="Write the full report to this file")
+    parser.add_argument("--strict", action="store_true", help="Fail if any output differs from the bs4 reference")
+    args = parser.parse_args()
+
+    backends = [b for b in available_backends() if not args.backend or b in args.backend]
+    report = run(load_fixtures(args.fixtures, args.scale), backends, args.repeat)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    mismatched = any(not r["identical"] for e in report["fixtures"].values() for r in e["results"].values())
+    return 1 if mismatched and args.strict else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,467 @@
+"""
+Benchmark and load-test runner for the app's HTTP endpoints.
+
+Starts a fake OpenAI API (fake_openai.py) and an HTML fixture server (fixture_server.py),
+generates TXT/PDF/DOCX inputs (corpus.py), then:
+  1. times each processing stage in-process (save, extract, LLM call, convert, webpage),
+  2. for every gunicorn configuration (workers x threads, or "auto" for the values
+     gunicorn.conf.py derives) boots the app and load-tests
+     each endpoint with concurrent clients; the fake API is exempt from the app's OpenAI
+     rate limits there,
+  3. reruns the text summarization endpoints with the production limits in place
+     (config "auto-openai-limits"), to measure the client's own rate limiting.
+Reports p50/p95/p99 latency, throughput, peak RSS (Linux /proc) and the server-side
+per-stage breakdown from the Server-Timing header, and writes everything as JSON for
+comparison with bench/compare.py.
+
+Usage (from the repository root):
+    python bench/run_bench.py
+    python bench/run_bench.py --configs 1x1,2x4,4x8 --requests 40 --concurrency 8 --llm-latency 1.0
+    python bench/run_bench.py --endpoints summarize_pdf --skip-stages --out results.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import corpus
+import fake_openai
+import fixture_server
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "bench", "results")
+# Run once more with the app's production OpenAI limits, so the client's own rate limiting is measured too.
+RATE_LIMITED_SCENARIOS = ("summarize_text", "summarize_txt_large")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+# --- Measurement helpers ---
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize_timings(timings_ms):
+    values = sorted(timings_ms)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 3),
+        "p50_ms": round(percentile(values, 0.50), 3),
+        "p95_ms": round(percentile(values, 0.95), 3),
+        "p99_ms": round(percentile(values, 0.99), 3),
+        "max_ms": round(values[-1], 3),
+    }
+
+
+def _process_children():
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def process_tree_rss(pid):
+    """Resident set size in bytes of pid and all its descendants (0 where /proc is unavailable)."""
+    if not os.path.isdir("/proc"):
+        return 0
+    children = _process_children()
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f"/proc/{current}/statm", "r") as f:
+                total += int(f.read().split()[1]) * PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            pass
+        stack.extend(children.get(current, []))
+    return total
+
+
+class RSSSampler:
+    """Background sampler recording the peak RSS of a process tree."""
+
+    def __init__(self, pid, interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, process_tree_rss(self.pid))
+            self._stop.wait(self.interval)
+
+    def reset(self):
+        self.peak = process_tree_rss(self.pid)
+
+    def __enter__(self):
+        self.reset()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def peak_mb(self):
+        return round(self.peak / (1024 * 1024), 1)
+
+
+# --- Stage benchmarks (in-process) ---
+def run_stages(corpus_files, fixture_url, fixture_names, repeat):
+    """Time save / extract / llm / convert / webpage stages by calling the app's functions directly."""
+    from werkzeug.datastructures import FileStorage
+
+    import main
+    from conversion import convert_pdf_file
+
+    stages = {}
+
+    def measure(name, fn):
+        timings = []
+        with RSSSampler(os.getpid()) as sampler:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                fn()
+                timings.append((time.perf_counter() - started) * 1000)
+        stages[name] = dict(summarize_timings(timings), peak_rss_mb=sampler.peak_mb)
+        print(f"  stage {name:<28} p50 {stages[name]['p50_ms']:>10.2f} ms   p95 {stages[name]['p95_ms']:>10.2f} ms")
+
+    for (kind, size), path in sorted(corpus_files.items()):
+        with open(path, "rb") as f:
+            payload = f.read()
+        target = os.path.join(main.UPLOAD_FOLDER, f"bench_stage_{size}.{kind}")
+
+        def save(payload=payload, target=target, kind=kind):
+            FileStorage(stream=io.BytesIO(payload), filename=f"upload.{kind}").save(target)
+
+        measure(f"save.{kind}.{size}", save)
+        measure(f"extract.{kind}.{size}", lambda target=target: main.extract_text_from_file(target))
+        if kind == "pdf" and size != "large":
+            docx_target = os.path.join(main.CONVERTED_FOLDER, f"bench_stage_{size}.docx")
+            measure(f"convert.pdf.{size}", lambda target=target, docx_target=docx_target: convert_pdf_file(target, docx_target))
+            os.remove(docx_target)
+        os.remove(target)
+
+    with open(corpus_files[("txt", "small")], "r", encoding="utf-8") as f:
+        small_text = f.read()
+    measure("llm.chat_completion", lambda: main.request_chat_completion(
+        main.TEXT_SUMMARY_SYSTEM_PROMPT, main.TEXT_SUMMARY_USER_PREFIX + small_text))
+
+    for name in fixture_names:
+        url = f"{fixture_url}/{name}"
+        measure(f"webpage.{name}", lambda url=url: main.extract_text_from_webpage(url))
+    return stages
+
+
+# --- HTTP load tests (gunicorn) ---
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(workers, threads, env, timeout=60):
+    """Boot the app with gunicorn.conf.py; workers/threads of None keep the config's derived values."""
+    port = _free_port()
+    env = dict(env, GUNICORN_BIND=f"127.0.0.1:{port}")
+    if workers is not None:
+        env["GUNICORN_WORKERS"] = str(workers)
+    if threads is not None:
+        env["GUNICORN_THREADS"] = str(threads)
+        env["GUNICORN_WORKER_CLASS"] = "gthread" if threads > 1 else "sync"
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning", "main:app"]
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+        try:
+            if requests.get(base_url + "/", timeout=1).status_code == 200:
+                return process, base_url
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("gunicorn did not become ready in time")
+
+
+def stop_gunicorn(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def unique_pdf(payload):
+    """
+    Make PDF bytes unique with a comment after %%EOF (ignored by PDF readers), so the app's
+    content-hash conversion dedup can't answer a benchmark request from an earlier conversion.
+    """
+    return payload + f"\n%bench-{uuid.uuid4().hex}\n".encode("ascii")
+
+
+def build_scenarios(corpus_files, fixture_url, fixture_names, reuse_conversions=False):
+    """name -> function(base_url) returning (status_code, ttfb_ms or None, Server-Timing header or None)."""
+    def upload(path, field="file", route="/summarize", stream=False, unique=False):
+        with open(path, "rb") as f:
+            payload = f.read()
+        filename = os.path.basename(path)
+
+        def call(base_url):
+            body = unique_pdf(payload) if unique else payload
+            started = time.perf_counter()
+            response = requests.post(base_url + route, files={field: (filename, body)}, timeout=600, stream=stream)
+            ttfb = None
+            if stream:
+                for line in response.iter_lines():
+                    if ttfb is None and line.startswith(b"event: token"):
+                        ttfb = (time.perf_counter() - started) * 1000
+            else:
+                response.content
+            return response.status_code, ttfb, response.headers.get("Server-Timing")
+        return call
+
+    def summarize_webpage(url):
+        def call(base_url):
+            response = requests.post(base_url + "/summarize_webpage", json={"url": url}, timeout=600)
+            return response.status_code, None, response.headers.get("Server-Timing")
+        return call
+
+    with open(corpus_files[("txt", "small")], "r", encoding="utf-8") as f:
+        small_text = f.read()
+
+    def summarize_text(base_url):
+        response = requests.post(base_url + "/summarize", data={"text": small_text}, timeout=600)
+        return response.status_code, None, response.headers.get("Server-Timing")
+
+    scenarios = {"summarize_text": summarize_text}
+    for kind in ("txt", "pdf", "docx"):
+        for size in ("small", "large"):
+            scenarios[f"summarize_{kind}_{size}"] = upload(corpus_files[(kind, size)])
+    scenarios["summarize_stream_pdf_small"] = upload(corpus_files[("pdf", "small")], route="/summarize/stream", stream=True)
+    article = "news_article.html" if "news_article.html" in fixture_names else fixture_names[0]
+    scenarios["summarize_webpage"] = summarize_webpage(f"{fixture_url}/{article}")
+    # Every upload is a new document unless conversion reuse is what is being measured.
+    scenarios["convert_pdf_to_word"] = upload(corpus_files[("pdf", "medium")], field="pdf-file",
+                                              route="/convert_pdf_to_word", unique=not reuse_conversions)
+    scenarios["download_file"] = None  # Filled in once a conversion has produced a file
+    return scenarios
+
+
+def make_download_scenario(base_url, pdf_path):
+    with open(pdf_path, "rb") as f:
+        response = requests.post(base_url + "/convert_pdf_to_word",
+                                 files={"pdf-file": ("bench.pdf", f.read())}, timeout=600)
+    download_path = response.json()["download_url"].split("://", 1)[1].split("/", 1)[1]
+
+    def call(url_base):
+        download = requests.get(f"{url_base}/{download_path}", timeout=600)
+        return download.status_code, None, download.headers.get("Server-Timing")
+    return call
+
+
+def parse_server_timing(header):
+    """'save;dur=1.2, llm;dur=300.5' -> {'save': 1.2, 'llm': 300.5}"""
+    stages = {}
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur" and name:
+                try:
+                    stages[name] = stages.get(name, 0.0) + float(value)
+                except ValueError:
+                    pass
+    return stages
+
+
+def load_test(call, base_url, total, concurrency):
+    """
+    Run total calls with concurrency clients.
+    Returns latencies, ttfbs, server-side stage timings, status counts and wall time.
+    """
+    call(base_url)  # Warm-up (imports, pools, connections)
+    latencies, ttfbs, statuses, stage_timings = [], [], {}, {}
+    lock = threading.Lock()
+
+    def one(_):
+        started = time.perf_counter()
+        try:
+            status, ttfb, server_timing = call(base_url)
+        except requests.exceptions.RequestException as e:
+            status, ttfb, server_timing = type(e).__name__, None, None
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if ttfb is not None:
+                ttfbs.append(ttfb)
+            for name, duration in parse_server_timing(server_timing).items():
+                stage_timings.setdefault(name, []).append(duration)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(total)))
+    return latencies, ttfbs, stage_timings, statuses, time.perf_counter() - started
+
+
+def run_config(label, workers, threads, env, scenarios, corpus_files, args, total=None):
+    if workers is None:
+        print(f"config {label}: workers and threads derived by gunicorn.conf.py")
+    else:
+        print(f"config {label}: {workers} worker(s) x {threads} thread(s)")
+    process, base_url = start_gunicorn(workers, threads, env)
+    results = {"workers": workers, "threads": threads, "endpoints": {}}
+    try:
+        with RSSSampler(process.pid) as sampler:
+            results["idle_rss_mb"] = round(process_tree_rss(process.pid) / (1024 * 1024), 1)
+            for name, call in scenarios.items():
+                if args.endpoints and not any(selected in name for selected in args.endpoints):
+                    continue
+                if name == "download_file":
+                    call = make_download_scenario(base_url, corpus_files[("pdf", "small")])
+                sampler.reset()
+                latencies, ttfbs, stage_timings, statuses, wall = load_test(call, base_url, total or args.requests,
+                                                                            args.concurrency)
+                entry = summarize_timings(latencies)
+                entry.update(
+                    throughput_rps=round(len(latencies) / wall, 3) if wall else None,
+                    statuses=statuses,
+                    errors=sum(count for status, count in statuses.items() if not status.startswith("2")),
+                    peak_rss_mb=sampler.peak_mb,
+                )
+                if ttfbs:
+                    entry["ttfb"] = summarize_timings(ttfbs)
+                if stage_timings:
+                    entry["server_stages"] = {name: summarize_timings(values) for name, values in stage_timings.items()}
+                results["endpoints"][name] = entry
+                print(f"  {name:<28} p50 {entry['p50_ms']:>10.1f} ms   p95 {entry['p95_ms']:>10.1f} ms   "
+                      f"p99 {entry['p99_ms']:>10.1f} ms   {entry['throughput_rps']:>7.2f} req/s   "
+                      f"rss {entry['peak_rss_mb']:>7.1f} MB   errors {entry['errors']}")
+    finally:
+        stop_gunicorn(process)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the app's endpoints and processing stages.")
+    parser.add_argument("--configs", default="1x1,2x4,auto",
+                        help="Comma-separated WORKERSxTHREADS gunicorn configs; \"auto\" uses gunicorn.conf.py's defaults")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per endpoint and config")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent clients")
+    parser.add_argument("--endpoints", action="append", help="Only run endpoints whose name contains this (repeatable)")
+    parser.add_argument("--stage-repeat", type=int, default=5, help="Repetitions per in-process stage")
+    parser.add_argument("--skip-stages", action="store_true")
+    parser.add_argument("--skip-http", action="store_true")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Fake OpenAI latency in seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--real-openai-limits", action="store_true",
+                        help="Keep the app's OpenAI RPM/TPM limits in every config (by default they are lifted for "
+                             "the fake API, and only the rate-limited config keeps them)")
+    parser.add_argument("--rate-limited-requests", type=int, default=8,
+                        help="Requests per endpoint in the rate-limited config (0 skips it)")
+    parser.add_argument("--html-scale", type=int, default=20, help="Repeat fixture page bodies N times")
+    parser.add_argument("--corpus", default=os.path.join(tempfile.gettempdir(), "aiapp-bench-corpus"))
+    parser.add_argument("--with-caches", action="store_true",
+                        help="Leave summary/webpage caches enabled and let identical PDF conversions be reused")
+    parser.add_argument("--out", help="JSON output path (default bench/results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    llm_config = fake_openai.FakeOpenAIConfig(latency=args.llm_latency, jitter=args.llm_jitter,
+                                              error_rate=args.llm_error_rate)
+    _, openai_url = fake_openai.start_in_thread(llm_config)
+    _, fixture_url, fixture_names = fixture_server.start_in_thread(scale=args.html_scale)
+    corpus_files = corpus.build_corpus(args.corpus)
+
+    env = dict(os.environ, OPENAI_API_KEY="bench-key", OPENAI_API_BASE=openai_url, SERVER_TIMING="true")
+    rate_limited_env = dict(env)
+    if not args.real_openai_limits:
+        # The production token buckets would make large inputs measure rate-limit sleeps, not the app.
+        env.update(OPENAI_RPM=str(10 ** 9), OPENAI_TPM=str(10 ** 12))
+    if not args.with_caches:
+        cache_settings = dict(SUMMARY_CACHE_SIZE="0", SUMMARY_CACHE_DB="", CHUNK_CACHE_SIZE="0", CHUNK_CACHE_DB="",
+                              WEBPAGE_TEXT_CACHE_TTL="0", WEB_HTTP_CACHE_BYTES="0")
+        env.update(cache_settings)
+        rate_limited_env.update(cache_settings)
+    os.environ.update(env)  # The in-process stage benchmarks import main with the same settings
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "settings": {k: v for k, v in vars(args).items() if k != "out"},
+        "stages": {},
+        "configs": {},
+    }
+
+    if not args.skip_stages:
+        print("in-process stages")
+        os.chdir(REPO_ROOT)
+        sys.path.insert(0, REPO_ROOT)
+        report["stages"] = run_stages(corpus_files, fixture_url, fixture_names, args.stage_repeat)
+
+    if not args.skip_http:
+        scenarios = build_scenarios(corpus_files, fixture_url, fixture_names, reuse_conversions=args.with_caches)
+        for label in args.configs.split(","):
+            if label.lower() == "auto":
+                workers = threads = None
+            else:
+                workers, threads = (int(part) for part in label.lower().split("x"))
+            report["configs"][label] = run_config(label, workers, threads, env, scenarios, corpus_files, args)
+        if not args.real_openai_limits and args.rate_limited_requests:
+            limited = {name: scenarios[name] for name in RATE_LIMITED_SCENARIOS}
+            report["configs"]["auto-openai-limits"] = run_config(
+                "auto-openai-limits", None, None, rate_limited_env, limited, corpus_files, args,
+                total=args.rate_limited_requests)
+
+    report["fake_openai"] = {"requests": llm_config.requests, "errors": llm_config.errors}
+    out_path = args.out or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
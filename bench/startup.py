@@ -0,0 +1,151 @@
+"""
+Start-up cost of the app: import time, resident memory and first-request latency.
+
+1. Imports main in fresh interpreters (--runs times) and reports the median import time,
+   RSS after import, the number of loaded modules and which heavy libraries got loaded.
+   In the same interpreter it then times the first PDF summarization, DOCX summarization and
+   webpage summarization, which pay for any library imported on first use.
+2. Boots gunicorn with --workers workers, with and without preload_app (GUNICORN_PRELOAD),
+   and reports the time until the first response plus the total RSS and PSS (proportional set
+   size, which splits pages shared copy-on-write between processes) of the process tree,
+   before and after each worker has served a PDF summarization.
+
+Usage (from the repository root):
+    python bench/startup.py
+    python bench/startup.py --runs 10 --workers 4 --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+import corpus
+import fake_openai
+import fixture_server
+from run_bench import REPO_ROOT, _process_children, process_tree_rss, start_gunicorn, stop_gunicorn
+
+HEAVY_MODULES = ("openai", "aiohttp", "numpy", "pdf2docx", "fitz", "cv2", "PyPDF2", "docx", "bs4", "lxml", "selectolax")
+
+# Runs in a fresh interpreter; prints one JSON line.
+IMPORT_PROBE = r"""
+import json, os, sys, time
+started = time.perf_counter()
+import main
+import_s = time.perf_counter() - started
+rss = int(open("/proc/self/statm").read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+result = {"import_ms": import_s * 1000, "rss_mb": rss / 2 ** 20, "modules": len(sys.modules),
+          "heavy": [name for name in HEAVY_MODULES if name in sys.modules]}
+client = main.app.test_client()
+for name, path, route in FIRST_REQUESTS:
+    started = time.perf_counter()
+    if route == "/summarize_webpage":
+        response = client.post(route, json={"url": path})
+    else:
+        with open(path, "rb") as f:
+            response = client.post(route, data={"file": (f, os.path.basename(path))})
+    assert response.status_code == 200, (name, response.status_code, response.get_data(as_text=True))
+    result[f"first_{name}_ms"] = (time.perf_counter() - started) * 1000
+print(json.dumps(result))
+"""
+
+
+def process_tree_pss(pid):
+    """Proportional set size in bytes of pid and its descendants (0 where smaps_rollup is unavailable)."""
+    children = _process_children()
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f"/proc/{current}/smaps_rollup", "r") as f:
+                for line in f:
+                    if line.startswith("Pss:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except (OSError, IndexError, ValueError):
+            pass
+        stack.extend(children.get(current, []))
+    return total
+
+
+def measure_imports(runs, env, first_requests):
+    probe = f"HEAVY_MODULES = {HEAVY_MODULES!r}\nFIRST_REQUESTS = {first_requests!r}\n" + IMPORT_PROBE
+    results = []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, "-c", probe], cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"import probe failed:\n{completed.stderr}")
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    summary = {key: round(statistics.median(r[key] for r in results), 1)
+               for key in results[0] if isinstance(results[0][key], (int, float))}
+    summary["heavy_after_import"] = results[0]["heavy"]
+    return summary
+
+
+def measure_gunicorn(workers, preload, env, pdf_path):
+    env = dict(env, GUNICORN_PRELOAD="true" if preload else "false")
+    started = time.perf_counter()
+    process, base_url = start_gunicorn(workers, None, env)
+    try:
+        result = {"workers": workers, "preload": preload,
+                  "ready_ms": round((time.perf_counter() - started) * 1000, 1),
+                  "idle_rss_mb": round(process_tree_rss(process.pid) / 2 ** 20, 1),
+                  "idle_pss_mb": round(process_tree_pss(process.pid) / 2 ** 20, 1)}
+        with open(pdf_path, "rb") as f:
+            payload = f.read()
+        for _ in range(workers * 4):  # Enough requests to reach every worker
+            response = requests.post(base_url + "/summarize", files={"file": ("doc.pdf", payload)}, timeout=120)
+            response.raise_for_status()
+        result["warm_rss_mb"] = round(process_tree_rss(process.pid) / 2 ** 20, 1)
+        result["warm_pss_mb"] = round(process_tree_pss(process.pid) / 2 ** 20, 1)
+        return result
+    finally:
+        stop_gunicorn(process)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time, memory and first-request latency.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time the import in")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers for the preload comparison")
+    parser.add_argument("--skip-gunicorn", action="store_true")
+    parser.add_argument("--corpus", default=os.path.join(tempfile.gettempdir(), "aiapp-bench-corpus"))
+    parser.add_argument("--json", help="Also write the results to this path")
+    args = parser.parse_args()
+
+    _, openai_url = fake_openai.start_in_thread(fake_openai.FakeOpenAIConfig(latency=0.0))
+    _, fixture_url, fixture_names = fixture_server.start_in_thread()
+    corpus_files = corpus.build_corpus(args.corpus, sizes=["small"], kinds=["pdf", "docx"])
+    first_requests = [
+        ("pdf", corpus_files[("pdf", "small")], "/summarize"),
+        ("docx", corpus_files[("docx", "small")], "/summarize"),
+        ("webpage", f"{fixture_url}/{fixture_names[0]}", "/summarize_webpage"),
+    ]
+    with tempfile.TemporaryDirectory() as state_dir:
+        env = dict(os.environ, OPENAI_API_KEY="bench-key", OPENAI_API_BASE=openai_url, SUMMARY_CACHE_SIZE="0",
+                   SUMMARY_CACHE_DB="", CHUNK_CACHE_SIZE="0", CHUNK_CACHE_DB="",
+                   WEBPAGE_TEXT_CACHE_TTL="0", WEB_HTTP_CACHE_BYTES="0",
+                   ARTIFACT_INDEX_DB=os.path.join(state_dir, "artifacts.sqlite3"))
+        report = {"import": measure_imports(args.runs, env, first_requests), "gunicorn": []}
+        if not args.skip_gunicorn:
+            for preload in (False, True):
+                report["gunicorn"].append(measure_gunicorn(args.workers, preload, env, corpus_files[("pdf", "small")]))
+
+    print("import main (median of {} runs):".format(args.runs))
+    for key, value in report["import"].items():
+        print(f"  {key:<22}{value}")
+    for row in report["gunicorn"]:
+        print(f"gunicorn {row['workers']} workers, preload={row['preload']}: ready {row['ready_ms']} ms, "
+              f"idle RSS {row['idle_rss_mb']} MB / PSS {row['idle_pss_mb']} MB, "
+              f"warm RSS {row['warm_rss_mb']} MB / PSS {row['warm_pss_mb']} MB")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import hashlib
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from summary_cache import make_cache_key
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4  # Rough average for English text with OpenAI tokenizers
+
+CHUNK_SYSTEM_PROMPT = "You are a helpful AI that summarizes one section of a longer document accurately and concisely, keeping every key fact, name and number."
+CHUNK_USER_PREFIX = "Please summarize the following section of a longer document:\n\n"
+REDUCE_USER_PREFIX = "The following are summaries of consecutive sections of one document. Please combine them into a single summary of the whole document:\n\n"
+
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n|\n")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+
+class SummaryDeadlineExceeded(Exception):
+    """Raised instead of starting more calls once a map-reduce run has used up its time budget."""
+
+
+class SummaryCancelled(Exception):
+    """Raised instead of starting more calls once the caller has cancelled a map-reduce run."""
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def max_input_chars(token_budget, chunk_tokens, reply_tokens):
+    """
+    Longest text whose map-reduce summary fits in token_budget tokens (roughly): each map call costs its
+    chunk plus reply_tokens, and the reduce levels over the chunk summaries add about reply_tokens/chunk_tokens again.
+    """
+    tokens_per_chunk = (chunk_tokens + reply_tokens) * (1 + reply_tokens / chunk_tokens)
+    return int(token_budget / tokens_per_chunk * chunk_tokens * CHARS_PER_TOKEN)
+
+
+def _split_units(text, max_chars):
+    """
+    Paragraphs where the text still has line breaks, otherwise sentences. A unit longer than
+    max_chars (e.g. a table or list with no sentence punctuation) is broken into words, which then
+    take part in the same anchor rule; only a single word longer than max_chars is cut at fixed offsets.
+    """
+    for paragraph in _PARAGRAPH_SPLIT.split(text):
+        for unit in _SENTENCE_SPLIT.split(paragraph.strip()):
+            if len(unit) <= max_chars:
+                if unit:
+                    yield unit
+                continue
+            for word in unit.split():
+                while len(word) > max_chars:
+                    yield word[:max_chars]
+                    word = word[max_chars:]
+                if word:
+                    yield word
+
+
+def _is_anchor(unit, divisor):
+    # Content-defined boundary: depends only on the unit itself, so an edit elsewhere
+    # doesn't move it and untouched chunks keep their cache keys.
+    return int(hashlib.md5(unit.encode("utf-8")).hexdigest()[:8], 16) % divisor == 0
+
+
+def split_into_chunks(text, max_tokens, min_tokens=None):
+    """
+    Split text on paragraph/sentence boundaries into chunks of at most max_tokens (estimated).
+    A chunk is closed at a content-defined anchor once it holds min_tokens, or when the next
+    unit would overflow it. Units longer than max_tokens are split into words (see _split_units).
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    min_chars = (min_tokens if min_tokens is not None else max_tokens // 2) * CHARS_PER_TOKEN
+    chunks = []
+    current = []
+    current_len = 0
+
+    def flush():
+        nonlocal current, current_len
+        if current:
+            chunks.append(" ".join(current))
+        current, current_len = [], 0
+
+    for unit in _split_units(text, max_chars):
+        if current and current_len + 1 + len(unit) > max_chars:
+            flush()
+        current.append(unit)
+        current_len += len(unit) + (1 if current_len else 0)
+        if current_len >= min_chars and _is_anchor(unit, 4):
+            flush()
+    flush()
+    return chunks
+
+
+class ChunkedSummarizer:
+    """
+    Map-reduce summarization for texts too long for a single request.
+    - Map: chunks are summarized concurrently on a bounded thread pool, each cached by content.
+    - Reduce: partial summaries are combined; if they are still too long they are grouped and
+      reduced again (hierarchically) until one final pass fits.
+    complete(system_prompt, user_content) performs one chat completion and returns its text.
+    With a deadline (time.monotonic() value), no call is started after it: the run raises
+    SummaryDeadlineExceeded instead, and the same is checked before each reduce level. A cancel
+    event (threading.Event) stops a run the same way with SummaryCancelled, e.g. when the client
+    waiting for it has gone away. Within a level, the first failed call drops the calls not yet started.
+    """
+
+    def __init__(self, complete, cache, model, chunk_tokens=3000, max_workers=4):
+        self.complete = complete
+        self.cache = cache
+        self.model = model
+        self.chunk_tokens = chunk_tokens
+        self.max_workers = max_workers
+
+    @staticmethod
+    def _check_deadline(deadline, cancel=None):
+        if cancel is not None and cancel.is_set():
+            raise SummaryCancelled("Map-reduce summarization was cancelled.")
+        if deadline is not None and time.monotonic() > deadline:
+            raise SummaryDeadlineExceeded("Map-reduce summarization ran out of its time budget.")
+
+    def _cached_complete(self, system_prompt, user_prefix, text, deadline=None, cancel=None):
+        key = make_cache_key(user_prefix + text, self.model, system_prompt)
+        summary = self.cache.get(key)
+        if summary is None:
+            self._check_deadline(deadline, cancel)
+            summary = self.complete(system_prompt, user_prefix + text)
+            self.cache.set(key, summary)
+        return summary
+
+    def _map(self, system_prompt, user_prefix, texts, deadline=None, cancel=None, progress=None):
+        """Summarize texts concurrently, returning summaries in order; progress(done, total) follows each one."""
+        def run(text):
+            return self._cached_complete(system_prompt, user_prefix, text, deadline, cancel)
+
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(texts)))
+        try:
+            futures = [executor.submit(run, text) for text in texts]
+            for done, future in enumerate(as_completed(futures), 1):
+                future.result()
+                if progress is not None:
+                    progress(done, len(texts))
+            return [future.result() for future in futures]
+        finally:
+            # On a failure, calls still queued are dropped; those already running finish first.
+            executor.shutdown(cancel_futures=True)
+
+    def _group(self, summaries):
+        """Pack consecutive summaries into groups that each fit one request."""
+        groups, current, current_tokens = [], [], 0
+        for summary in summaries:
+            tokens = estimate_tokens(summary) + 1
+            if current and current_tokens + tokens > self.chunk_tokens:
+                groups.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(summary)
+            current_tokens += tokens
+        if current:
+            groups.append("\n\n".join(current))
+        return groups
+
+    def reduce_partials(self, text, deadline=None, cancel=None, progress=None):
+        """
+        Run the map and intermediate reduce levels; return the input for the final pass.
+        progress(level, done, total) is called as each call of a level finishes (level 0 is the map).
+        """
+        def level_progress(level):
+            return None if progress is None else lambda done, total: progress(level, done, total)
+
+        chunks = split_into_chunks(text, self.chunk_tokens)
+        logger.info(f"Map-reduce summarization: {len(chunks)} chunks of up to {self.chunk_tokens} tokens.")
+        summaries = self._map(CHUNK_SYSTEM_PROMPT, CHUNK_USER_PREFIX, chunks, deadline, cancel, level_progress(0))
+
+        level = 1
+        while len(summaries) > 1 and estimate_tokens("\n\n".join(summaries)) > self.chunk_tokens:
+            groups = self._group(summaries)
+            if len(groups) == len(summaries):
+                break  # Summaries can't be packed any tighter; let the final pass take them as-is
+            self._check_deadline(deadline, cancel)
+            logger.info(f"Map-reduce level {level}: reducing {len(summaries)} partial summaries in {len(groups)} groups.")
+            summaries = self._map(CHUNK_SYSTEM_PROMPT, REDUCE_USER_PREFIX, groups, deadline, cancel, level_progress(level))
+            level += 1
+
+        return "\n\n".join(summaries)
+
+    def summarize(self, text, system_prompt, deadline=None):
+        """Summarize text of any length; the final pass uses the caller's system prompt."""
+        partials = self.reduce_partials(text, deadline)
+        return self._cached_complete(system_prompt, REDUCE_USER_PREFIX, partials, deadline)
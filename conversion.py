@@ -0,0 +1,82 @@
+import logging
+import re
+
+from jobs import report_progress
+
+logger = logging.getLogger(__name__)
+
+# pdf2docx reports progress through log records such as "[3/4] Parsing pages..." and "(2/10) Page 2".
+_STAGE_PATTERN = re.compile(r"^\[(\d)/4\]")
+_PAGE_PATTERN = re.compile(r"^\((\d+)/(\d+)\) Page")
+_ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;]*m")  # Stage lines are colourised
+# Fraction of total work completed when each pdf2docx stage starts / ends.
+_STAGE_SPAN = {1: (0.0, 0.05), 2: (0.05, 0.1), 3: (0.1, 0.7), 4: (0.7, 1.0)}
+
+
+class _ProgressLogHandler(logging.Handler):
+    """Turns pdf2docx log lines into (stage, fraction) progress callbacks."""
+
+    def __init__(self, callback):
+        super().__init__(level=logging.INFO)
+        self.callback = callback
+        self.stage = 1
+
+    def emit(self, record):
+        try:
+            message = _ANSI_ESCAPE.sub("", record.getMessage()).strip()
+            stage_match = _STAGE_PATTERN.match(message)
+            if stage_match:
+                self.stage = int(stage_match.group(1))
+                self.callback(message, _STAGE_SPAN.get(self.stage, (0.0, 0.0))[0])
+                return
+            page_match = _PAGE_PATTERN.match(message)
+            if page_match:
+                done, total = int(page_match.group(1)), int(page_match.group(2))
+                low, high = _STAGE_SPAN.get(self.stage, (0.0, 0.0))
+                self.callback(message, low + (high - low) * done / max(total, 1))
+        except Exception:
+            pass  # Progress reporting must never break a conversion
+
+
+def convert_pdf_file(pdf_path, docx_path, start=0, end=10, progress_callback=None):
+    """
+    Convert pages [start, end) of pdf_path into docx_path with pdf2docx.
+    progress_callback(message, fraction) is invoked as pdf2docx advances, if given.
+    Raises on failure; the caller decides how to report it.
+    """
+    # Imported here: pdf2docx loads PyMuPDF, OpenCV and NumPy, which only conversion workers need.
+    from pdf2docx import Converter
+
+    handler = None
+    converter = None
+    if progress_callback:
+        handler = _ProgressLogHandler(progress_callback)
+        logging.getLogger().addHandler(handler)
+    try:
+        converter = Converter(pdf_path)
+        converter.convert(docx_path, start=start, end=end)
+    finally:
+        if converter:
+            try:
+                converter.close()
+            except Exception as e_close:
+                logger.error(f"Error closing PDF converter for {pdf_path}: {e_close}")
+        if handler:
+            logging.getLogger().removeHandler(handler)
+    return docx_path
+
+
+def conversion_error_message(error):
+    """Map a conversion exception to (user_message, http_status)."""
+    text = str(error).lower()
+    if "wrong password" in text or "password required" in text:
+        return "Conversion error: The PDF might be password-protected.", 400
+    return f"Conversion error: {str(error)}", 500
+
+
+def convert_pdf_job(job_id, pdf_path, docx_path, start=0, end=10):
+    """JobQueue entry point: convert_pdf_file with progress relayed to the parent process."""
+    return convert_pdf_file(
+        pdf_path, docx_path, start=start, end=end,
+        progress_callback=lambda message, fraction: report_progress(job_id, message, fraction),
+    )
@@ -0,0 +1,63 @@
+import importlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentHandler:
+    """
+    A document extractor or converter named as "module:function", resolved on first call.
+    libraries lists the heavy packages the function imports when it runs; they are only
+    loaded by the first document that needs them, or ahead of time by warm_up().
+    """
+
+    def __init__(self, target, libraries=()):
+        self.module_name, self.function_name = target.split(":")
+        self.libraries = tuple(libraries)
+        self._function = None
+
+    def load(self):
+        if self._function is None:
+            # import_module is thread-safe: concurrent first calls wait for the module to finish importing.
+            self._function = getattr(importlib.import_module(self.module_name), self.function_name)
+        return self._function
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def warm_up(self):
+        self.load()
+        for name in self.libraries:
+            importlib.import_module(name)
+
+
+# Text extractors by file extension. Plain text needs no library and is decoded by the caller.
+EXTRACTORS = {
+    ".pdf": DocumentHandler("text_extraction:extract_pdf_text", libraries=("PyPDF2",)),
+    ".docx": DocumentHandler("text_extraction:extract_docx_text", libraries=("docx",)),
+}
+# Converters by (source extension, target extension). pdf2docx brings in PyMuPDF, OpenCV and NumPy.
+CONVERTERS = {
+    (".pdf", ".docx"): DocumentHandler("conversion:convert_pdf_job", libraries=("pdf2docx",)),
+}
+
+
+def get_extractor(extension):
+    """The text extractor for a file extension (e.g. ".pdf"), or None if the format has no handler."""
+    return EXTRACTORS.get(extension.lower())
+
+
+def get_converter(source_extension, target_extension):
+    return CONVERTERS.get((source_extension.lower(), target_extension.lower()))
+
+
+def warm_up():
+    """Import every handler and its libraries now; returns the library names. Failures are logged, not raised."""
+    loaded = []
+    for handler in list(EXTRACTORS.values()) + list(CONVERTERS.values()):
+        try:
+            handler.warm_up()
+            loaded.extend(handler.libraries)
+        except ImportError as e_import:
+            logger.warning(f"Could not pre-import {handler.module_name}:{handler.function_name}: {e_import}")
+    return loaded
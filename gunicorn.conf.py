@@ -0,0 +1,108 @@
+"""
+Gunicorn settings for production (used by the Procfile: gunicorn -c gunicorn.conf.py main:app).
+
+Runs gthread workers: each worker process serves `threads` requests at once, so requests
+waiting on OpenAI or a remote webpage don't hold up each other. CPU-heavy work (PDF->DOCX
+conversion, large PDF text extraction) runs in the app's process pools rather than in
+request threads.
+
+Worker and thread counts are derived from the CPUs and memory available to the container;
+override them with GUNICORN_WORKERS / GUNICORN_THREADS. The chosen values are exported as
+SERVER_WORKERS / SERVER_THREADS so the app can split per-process budgets (OpenAI rate limits,
+process pool sizes, connection pools) between workers. State that must be seen by every worker
+(conversion job status for /jobs/<id> polls, conversions in progress for deduplication, the
+artifact index) is kept in the SQLite index at ARTIFACT_INDEX_DB, which all workers share, and
+/metrics merges the metrics every worker writes to METRICS_DIR.
+
+The app imports its heavy libraries (openai, PyPDF2, python-docx, pdf2docx) on first use, so a
+worker starts quickly and only pays for what its requests need. With GUNICORN_PRELOAD=true the
+master instead imports the app and all of those libraries once before forking: workers share
+those pages copy-on-write and start warm. (The conversion and extraction pools start their
+processes from a fork server, never by forking a multi-threaded worker, so each pool process
+imports its libraries with its first task.)
+Code changes then need a full restart rather than a HUP.
+"""
+import glob
+import os
+import time
+
+
+def _cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _memory_limit_bytes():
+    """The container's memory limit (cgroup v2/v1) or the machine's total memory, whichever is lower."""
+    limits = []
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value.isdigit():
+                limits.append(int(value))
+        except OSError:
+            pass
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    limits.append(int(line.split()[1]) * 1024)
+                    break
+    except OSError:
+        pass
+    return min(limits) if limits else None
+
+
+cpus = _cpu_count()
+memory = _memory_limit_bytes()
+# Budget per worker, including its share of the conversion/extraction process pools.
+worker_memory = int(os.environ.get("GUNICORN_WORKER_MEMORY_MB", 512)) * 1024 * 1024
+
+# One worker per CPU, as many as memory allows; fewer workers get more threads each.
+_default_workers = max(1, min(cpus, memory // worker_memory if memory else cpus))
+workers = int(os.environ.get("GUNICORN_WORKERS", _default_workers))
+threads = int(os.environ.get("GUNICORN_THREADS", max(8, min(32, 4 * cpus // workers))))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 300))  # Synchronous conversions can take minutes
+keepalive = 5
+# Each worker owns the process pool its conversion jobs run in. A stopping worker (deploy, recycling)
+# finishes its queued and running jobs before it exits, so give it as long as a conversion may take;
+# anything still running when graceful_timeout is up is killed and its job reported as failed.
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", timeout))
+# Recycling a worker every N requests (to cap slow growth in parsers' memory) would also make it stop
+# taking requests while it drains its conversions, so it is off unless GUNICORN_MAX_REQUESTS is set.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+preload_app = os.environ.get("GUNICORN_PRELOAD", "false").lower() == "true"
+
+# Read by main.py in every worker (set here, in the master, before workers are forked).
+os.environ["SERVER_WORKERS"] = str(workers)
+os.environ["SERVER_THREADS"] = str(threads)
+# Workers write their metrics here and /metrics merges them; emptied when the server starts.
+os.environ.setdefault("METRICS_DIR", os.path.join("cache", "metrics"))
+# CPU-bound pools are per worker: share the CPUs out instead of starting cpus x workers processes.
+os.environ.setdefault("PDF_EXTRACT_WORKERS", str(max(1, cpus // workers)))
+os.environ.setdefault("CONVERSION_WORKERS", str(max(1, cpus // (2 * workers))))
+
+
+def on_starting(server):
+    for path in glob.glob(os.path.join(os.environ["METRICS_DIR"], "*.json")):
+        os.remove(path)  # Left by a previous server; counters start again from zero
+    server.log.info(f"{workers} {worker_class} worker(s) x {threads} thread(s) "
+                    f"for {cpus} CPU(s), {memory // (1024 * 1024) if memory else '?'} MB memory")
+
+
+def when_ready(server):
+    # Runs in the master before the first worker is forked; with preload_app, main is already imported.
+    if not preload_app:
+        return
+    import main
+
+    started = time.perf_counter()
+    loaded = main.warm_up()
+    server.log.info(f"Pre-imported {', '.join(loaded)} in {time.perf_counter() - started:.2f}s")
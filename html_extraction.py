@@ -0,0 +1,183 @@
+import importlib
+import importlib.util
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Backends: selectolax (optional, pip install selectolax) > lxml > bs4 (reference and fallback).
+# Compare them with bench/html_parity.py.
+
+# Subtrees dropped before looking for content
+NON_CONTENT_TAGS = ["script", "style", "header", "footer", "nav", "aside"]
+# Main-content candidates, in priority order (the first selector that matches anything wins)
+MAIN_SELECTORS = ["article", "main", ".main-content", "#content", ".entry-content", ".post-body"]
+
+
+def _normalize(texts):
+    text_content = "\n".join(filter(None, texts))  # Join non-empty lines
+    return " ".join(text_content.split()).strip()  # Normalize whitespace
+
+
+def _matches(selector, tag, element_id, classes):
+    if selector.startswith("."):
+        return selector[1:] in classes
+    if selector.startswith("#"):
+        return element_id == selector[1:]
+    return tag == selector
+
+
+# --- Backends ---
+# Each backend takes decoded HTML and returns normalized text with the same semantics:
+# drop NON_CONTENT_TAGS subtrees, pick the first MAIN_SELECTORS match (else <body>), then
+# join the text of its <p> descendants, or all of its text if it has none.
+
+def extract_with_bs4(html):
+    """Reference implementation on BeautifulSoup's pure-Python html.parser (always available)."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for script_or_style in soup(NON_CONTENT_TAGS):
+        script_or_style.decompose()
+
+    content_area = None
+    for selector in MAIN_SELECTORS:
+        content_area = soup.select_one(selector)
+        if content_area:
+            break
+    target_element = content_area if content_area else soup.body  # Fallback to body
+
+    texts = []
+    if target_element:
+        paragraphs = target_element.find_all("p", recursive=True)
+        if paragraphs:
+            texts.extend(para.get_text(separator=" ", strip=True) for para in paragraphs)
+        else:
+            texts.append(target_element.get_text(separator=" ", strip=True))
+    return _normalize(texts)
+
+
+def extract_with_lxml(html):
+    """libxml2 parser; non-content subtrees are dropped and candidates found in a single walk."""
+    import lxml.html
+    from lxml import etree
+
+    if not html.strip():
+        return ""
+    root = lxml.html.document_fromstring(html)
+    for element in list(root.iter(*NON_CONTENT_TAGS)):
+        element.drop_tree()
+
+    first_match = {}
+    body = None
+    for element in root.iter(etree.Element):  # Skips comments and processing instructions
+        tag = element.tag
+        if tag == "body" and body is None:
+            body = element
+        classes = element.get("class", "").split()
+        element_id = element.get("id")
+        for selector in MAIN_SELECTORS:
+            if selector not in first_match and _matches(selector, tag, element_id, classes):
+                first_match[selector] = element
+    target_element = next((first_match[s] for s in MAIN_SELECTORS if s in first_match), body)
+
+    def element_text(element):
+        return " ".join(part.strip() for part in element.itertext() if part.strip())
+
+    texts = []
+    if target_element is not None:
+        paragraphs = list(target_element.iter("p"))
+        if paragraphs:
+            texts.extend(element_text(para) for para in paragraphs)
+        else:
+            texts.append(element_text(target_element))
+    return _normalize(texts)
+
+
+def extract_with_selectolax(html):
+    """Lexbor C parser via selectolax; all candidates come from one combined CSS query."""
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(html)
+    tree.strip_tags(NON_CONTENT_TAGS)
+
+    candidates = tree.css(", ".join(MAIN_SELECTORS))
+    target_element = None
+    for selector in MAIN_SELECTORS:
+        for node in candidates:
+            if _matches(selector, node.tag, node.attributes.get("id"), (node.attributes.get("class") or "").split()):
+                target_element = node
+                break
+        if target_element is not None:
+            break
+    if target_element is None:
+        target_element = tree.body
+
+    texts = []
+    if target_element is not None:
+        paragraphs = target_element.css("p")
+        if paragraphs:
+            texts.extend(para.text(separator=" ", strip=True) for para in paragraphs)
+        else:
+            texts.append(target_element.text(separator=" ", strip=True))
+    return _normalize(texts)
+
+
+BACKENDS = {
+    "selectolax": (extract_with_selectolax, "selectolax.lexbor"),
+    "lxml": (extract_with_lxml, "lxml.html"),
+    "bs4": (extract_with_bs4, "bs4"),
+}
+# Preference order for "auto"; bs4 is the fallback and is always installed, so "auto" always resolves.
+AUTO_ORDER = ["selectolax", "lxml", "bs4"]
+
+_resolved = {}
+
+
+def _installed(module_name):
+    """True if module_name can be imported, checked without importing it (only its parent packages)."""
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except ImportError:
+        return False
+
+
+def available_backends():
+    """Names of backends whose parser library is installed here."""
+    return [name for name in AUTO_ORDER if _installed(BACKENDS[name][1])]
+
+
+def resolve_backend(name=None):
+    """Return the extraction function for name ('auto' or None picks the fastest available)."""
+    name = (name or os.environ.get("HTML_EXTRACT_BACKEND") or "auto").lower()
+    if name not in _resolved:
+        if name == "auto":
+            choice = available_backends()[0]
+        elif name in BACKENDS and name in available_backends():
+            choice = name
+        else:
+            logger.warning(f"HTML extraction backend '{name}' is not available. Falling back to bs4.")
+            choice = "bs4"
+        logger.info(f"Using '{choice}' HTML extraction backend.")
+        _resolved[name] = BACKENDS[choice][0]
+    return _resolved[name]
+
+
+def warm_up(name=None):
+    """Import the parser library of the backend resolve_backend(name) picks; returns its module name."""
+    extract = resolve_backend(name)
+    module_name = next(module for function, module in BACKENDS.values() if function is extract)
+    importlib.import_module(module_name)
+    return module_name
+
+
+def extract_main_text(html, backend=None):
+    """Extract readable main-content text from an HTML document, falling back to bs4 on backend errors."""
+    extract = resolve_backend(backend)
+    try:
+        return extract(html)
+    except Exception as e:
+        if extract is extract_with_bs4:
+            raise
+        logger.warning(f"HTML extraction backend failed ({type(e).__name__}: {e}). Falling back to bs4.")
+        return extract_with_bs4(html)
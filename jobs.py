@@ -0,0 +1,421 @@
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import sqlite_db
+
+logger = logging.getLogger(__name__)
+
+# Pool processes are started by a fork server rather than forked from the (multi-threaded) web worker:
+# a fork can copy a lock that another thread holds at that moment, e.g. the import lock of a module
+# it is importing lazily, and the child would then block on it forever.
+POOL_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+# Set inside each pool worker by _init_worker; lets job functions report progress to the parent.
+_worker_progress_queue = None
+
+
+class JobQueueFull(Exception):
+    """Raised when the pool already holds as many jobs as it is allowed to queue."""
+
+
+def _init_worker(progress_queue):
+    global _worker_progress_queue
+    _worker_progress_queue = progress_queue
+
+
+def report_progress(job_id, message, fraction):
+    """Called from inside a worker process; a no-op outside the pool."""
+    if _worker_progress_queue is None:
+        return
+    try:
+        _worker_progress_queue.put_nowait((job_id, message, fraction))
+    except Exception:
+        pass
+
+
+def _run_job(job_id, fn, args, kwargs):
+    report_progress(job_id, "running", 0.0)
+    return fn(job_id, *args, **kwargs)
+
+
+def _process_alive(host, pid):
+    if host != socket.gethostname():
+        return True  # A process on another machine sharing the index can't be checked from here
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobIndex:
+    """
+    Job records and claims in a SQLite file shared by every worker process using the same db_path.
+    - A JobQueue given this index writes its jobs' status there, so any worker can answer a poll.
+    - claim(key) lets one request at a time own a piece of work (e.g. converting one PDF); identical
+      requests in any worker get the owner's job id instead, once it has been attached.
+    Jobs and claims of an owner process that has exited read as failed / are taken over; records
+    untouched for longer than ttl seconds are treated the same way and eventually pruned.
+    """
+
+    def __init__(self, db_path, ttl=3600):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._owner_pid = None
+        self._init_db()
+
+    def _connect(self):
+        return sqlite_db.connect(self.db_path)
+
+    def _init_db(self):
+        with sqlite_db.init_db(self.db_path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, status TEXT NOT NULL, progress REAL NOT NULL, message TEXT,"
+                " created_at REAL NOT NULL, started_at REAL, finished_at REAL, error TEXT, meta TEXT,"
+                " owner_host TEXT NOT NULL, owner_pid INTEGER NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_claims ("
+                " key TEXT PRIMARY KEY, claim_id TEXT NOT NULL, job_id TEXT,"
+                " owner_host TEXT NOT NULL, owner_pid INTEGER NOT NULL, claimed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs (updated_at)")
+
+    def _owner(self):
+        """(host, pid) recorded as owner. The first call in a process clears records left by an earlier process with this pid."""
+        host, pid = socket.gethostname(), os.getpid()
+        if self._owner_pid != pid:
+            self._owner_pid = pid
+            now = time.time()
+            with self._connect() as conn:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', message = 'failed', error = ?, finished_at = ?, updated_at = ?"
+                    " WHERE owner_host = ? AND owner_pid = ? AND finished_at IS NULL",
+                    ("The worker running this job stopped.", now, now, host, pid),
+                )
+                conn.execute("DELETE FROM job_claims WHERE owner_host = ? AND owner_pid = ?", (host, pid))
+        return host, pid
+
+    def _stale(self, host, pid, updated_at, now):
+        return now - updated_at > self.ttl or not _process_alive(host, pid)
+
+    # --- Jobs ---
+    def save(self, job):
+        """Record the current state of a job owned by this process."""
+        host, pid = self._owner()
+        error = str(job["error"]) if job["error"] is not None else None
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, status, progress, message, created_at, started_at, finished_at,"
+                " error, meta, owner_host, owner_pid, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job["id"], job["status"], job["progress"], job["message"], job["created_at"], job["started_at"],
+                 job["finished_at"], error, json.dumps(job["meta"]), host, pid, time.time()),
+            )
+
+    def delete(self, job_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def load(self, job_id):
+        """Return the job record (with error as text and no result), or None if unknown or expired."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT status, progress, message, created_at, started_at, finished_at, error, meta,"
+                " owner_host, owner_pid, updated_at FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        status, progress, message, created_at, started_at, finished_at, error, meta, host, pid, updated_at = row
+        now = time.time()
+        if finished_at is None and self._stale(host, pid, updated_at, now):
+            status, message, error, finished_at = "failed", "failed", "The worker running this job stopped.", now
+        return {
+            "id": job_id,
+            "status": status,
+            "progress": progress,
+            "message": message,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "result": None,
+            "error": error,
+            "meta": json.loads(meta) if meta else {},
+        }
+
+    def prune(self, now):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE updated_at < ?", (now - self.ttl,))
+            conn.execute("DELETE FROM job_claims WHERE claimed_at < ?", (now - self.ttl,))
+
+    # --- Claims ---
+    def claim(self, key, timeout=0, poll_interval=0.2):
+        """
+        Try to own key. Returns (claim_id, None) once this caller owns it (pass claim_id to attach() and
+        release()), or (None, job_id) once the current owner has attached its job. Waits up to timeout
+        seconds for either; (None, None) if neither happened in time.
+        """
+        deadline = time.monotonic() + timeout
+        host, pid = self._owner()
+        claim_id = uuid.uuid4().hex
+        while True:
+            now = time.time()
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR IGNORE INTO job_claims (key, claim_id, job_id, owner_host, owner_pid, claimed_at)"
+                    " VALUES (?, ?, NULL, ?, ?, ?)", (key, claim_id, host, pid, now),
+                )
+                row = conn.execute(
+                    "SELECT claim_id, job_id, owner_host, owner_pid, claimed_at FROM job_claims WHERE key = ?", (key,)
+                ).fetchone()
+            if row is not None:
+                owner_claim, job_id, owner_host, owner_pid, claimed_at = row
+                if owner_claim == claim_id:
+                    return claim_id, None
+                if self._stale(owner_host, owner_pid, claimed_at, now):
+                    logger.warning(f"Taking over claim on {key} from stopped process {owner_host}:{owner_pid}.")
+                    self.release(key, owner_claim)
+                    continue
+                if job_id is not None:
+                    return None, job_id
+            if time.monotonic() >= deadline:
+                return None, None
+            time.sleep(poll_interval)
+
+    def attach(self, key, claim_id, job_id):
+        """Publish the job that does the claimed work, for identical requests to follow."""
+        with self._connect() as conn:
+            conn.execute("UPDATE job_claims SET job_id = ? WHERE key = ? AND claim_id = ?", (job_id, key, claim_id))
+
+    def release(self, key, claim_id):
+        """Give up a claim (once its job has finished, or if it never started). A no-op if it is no longer held."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM job_claims WHERE key = ? AND claim_id = ?", (key, claim_id))
+
+
+class JobQueue:
+    """
+    Bounded process-pool job runner with status polling.
+    - At most max_workers jobs run at once; at most max_pending are accepted (running + waiting).
+    - submit() raises JobQueueFull beyond that so callers can answer 429.
+    - Finished jobs are kept for result_ttl seconds so clients can poll them.
+    The job function is called as fn(job_id, *args, **kwargs) in a worker process and
+    may call report_progress(job_id, message, fraction). An optional on_finish(job) callback
+    runs in this process once the job is done or failed.
+    If a worker process dies (segfault, OOM kill), the jobs it broke fail and the next submit()
+    starts a fresh pool and progress queue.
+    Job records live in this process; with a JobIndex, they are also written to it so that get()
+    and wait() work from every process sharing the index (e.g. all gunicorn workers).
+    """
+
+    def __init__(self, max_workers=2, max_pending=8, result_ttl=3600, index=None):
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, max_workers)
+        self.result_ttl = result_ttl
+        self.index = index
+
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+        self._jobs = {}
+        self._callbacks = {}  # job_id -> on_finish
+        self._pending = 0
+        self._executor = None
+        self._executor_pid = None
+        self._progress_queue = None
+        self._progress_thread = None
+
+    def _ensure_executor(self):
+        # Created lazily so the pool (and its helper thread) is started in the serving process, not at import;
+        # a pool inherited through fork() has no worker processes or drain thread in the child, so it is replaced.
+        if self._executor is not None and self._executor_pid != os.getpid():
+            self._executor = None
+            self._jobs.clear()
+            self._callbacks.clear()
+            self._pending = 0
+        if self._executor is None:
+            self._progress_queue = POOL_CONTEXT.Queue()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=POOL_CONTEXT,
+                initializer=_init_worker,
+                initargs=(self._progress_queue,),
+            )
+            self._executor_pid = os.getpid()
+            self._progress_thread = threading.Thread(target=self._drain_progress, args=(self._progress_queue,),
+                                                     name="job-progress", daemon=True)
+            self._progress_thread.start()
+        return self._executor
+
+    def _discard_executor(self, executor):
+        """Drop a broken pool (if it is still the current one) so the next submit() builds a new one."""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            progress_queue = self._progress_queue
+            self._executor = None
+            self._progress_queue = None
+        logger.error("Job worker process died; the process pool will be restarted.")
+        executor.shutdown(wait=False, cancel_futures=True)
+        try:
+            progress_queue.put_nowait(None)  # Stops its drain thread, which then drops the queue
+        except (OSError, ValueError):
+            pass
+
+    def _drain_progress(self, progress_queue):
+        while True:
+            try:
+                item = progress_queue.get()
+            except (EOFError, OSError):
+                return
+            if item is None:
+                return
+            job_id, message, fraction = item
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] in ("done", "failed"):
+                    continue
+                job["status"] = "running"
+                if job["started_at"] is None:
+                    job["started_at"] = time.time()
+                job["message"] = message
+                job["progress"] = max(job["progress"], round(min(fraction, 0.99), 3))
+                snapshot = dict(job)
+            self._save(snapshot)
+
+    def _save(self, job):
+        if self.index is None:
+            return
+        try:
+            self.index.save(job)
+        except Exception as e_index:
+            logger.error(f"Could not record job {job['id']} in the job index: {e_index}")
+
+    def _prune(self, now):
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and now - job["finished_at"] > self.result_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if self.index is not None:
+            try:
+                self.index.prune(now)
+            except Exception as e_index:
+                logger.error(f"Could not prune the job index: {e_index}")
+
+    def submit(self, fn, *args, meta=None, on_finish=None, **kwargs):
+        """Queue fn for execution and return its job id."""
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f"{self._pending} jobs already pending (limit {self.max_pending}).")
+            executor = self._ensure_executor()
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "id": job_id,
+                "status": "queued",
+                "progress": 0.0,
+                "message": "queued",
+                "created_at": now,
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None,
+                "meta": meta or {},
+            }
+            if on_finish is not None:
+                self._callbacks[job_id] = on_finish
+            self._pending += 1
+            snapshot = dict(self._jobs[job_id])
+        self._save(snapshot)
+        try:
+            try:
+                future = executor.submit(_run_job, job_id, fn, args, kwargs)
+            except BrokenProcessPool:
+                # A worker died since the last job finished; retry once on a fresh pool.
+                self._discard_executor(executor)
+                with self._lock:
+                    executor = self._ensure_executor()
+                future = executor.submit(_run_job, job_id, fn, args, kwargs)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+                del self._jobs[job_id]
+                self._callbacks.pop(job_id, None)
+            if self.index is not None:
+                self.index.delete(job_id)
+            raise
+        future.add_done_callback(lambda f, job_id=job_id, executor=executor: self._on_done(job_id, f, executor))
+        return job_id
+
+    def _on_done(self, job_id, future, executor):
+        error = future.exception() if not future.cancelled() else BrokenProcessPool("Job cancelled by a pool restart.")
+        if isinstance(error, BrokenProcessPool):
+            self._discard_executor(executor)
+        if error is None:
+            outcome = {"status": "done", "progress": 1.0, "message": "done", "result": future.result()}
+        else:
+            outcome = {"status": "failed", "message": "failed", "error": error}
+            logger.error(f"Job {job_id} failed: {error}")
+        with self._lock:
+            self._pending -= 1
+            on_finish = self._callbacks.pop(job_id, None)
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            snapshot = dict(job, finished_at=time.time(), **outcome)
+        # The job is only reported finished once on_finish has run (e.g. stored the job's output).
+        if on_finish is not None:
+            try:
+                on_finish(snapshot)
+            except Exception as e_callback:
+                logger.error(f"on_finish callback for job {job_id} failed: {e_callback}")
+        with self._lock:
+            job.update(snapshot)
+            self._finished.notify_all()
+        self._save(snapshot)
+
+    def get(self, job_id):
+        """Return a copy of the job record, or None if unknown or expired. Jobs of other processes come from the index."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        return self.index.load(job_id) if self.index is not None else None
+
+    def wait(self, job_id, timeout, poll_interval=0.25):
+        """Block until the job is done or failed, for up to timeout seconds. Returns its latest record (see get())."""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            if job_id in self._jobs:
+                self._finished.wait_for(
+                    lambda: self._jobs.get(job_id, {}).get("finished_at", 0) is not None, timeout)
+                job = self._jobs.get(job_id)
+                return dict(job) if job is not None else None
+        while True:
+            job = self.get(job_id)
+            if job is None or job["finished_at"] is not None or time.monotonic() >= deadline:
+                return job
+            time.sleep(poll_interval)
+
+    def stats(self):
+        with self._lock:
+            return {"pending": self._pending, "max_pending": self.max_pending, "max_workers": self.max_workers}
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,33 @@
+import importlib
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+    Used for libraries that are slow to import but only needed once a request uses them
+    (e.g. openai, which pulls in aiohttp and NumPy). Attribute access is safe from several
+    threads: importlib serialises concurrent first imports of the same module.
+    Attributes of the proxy itself (load) shadow module attributes of the same name.
+    """
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def load(self):
+        """Import the module now (if it isn't yet) and return it."""
+        module = self.__dict__["_module"]
+        if module is None:
+            module = importlib.import_module(self.__dict__["_name"])
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attribute):
+        return getattr(self.load(), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self.load(), attribute, value)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
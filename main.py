@@ -1,39 +1,293 @@
 import os
-import openai
 import requests
-from flask import Flask, request, render_template, jsonify, send_file, url_for
+from flask import Flask, Request, Response, request, render_template, jsonify, send_file, url_for
 from werkzeug.utils import secure_filename
-from pdf2docx import Converter
-from PyPDF2 import PdfReader, errors as PyPDF2Errors # For specific PyPDF2 errors
-from docx import Document
-from bs4 import BeautifulSoup
 import uuid # For unique filenames
+import hashlib
+import io
 import logging
+import json
+import mimetypes
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import metrics
+import document_handlers
+import html_extraction
+from artifact_store import ArtifactStore
+from lazy_imports import LazyModule
+from openai_client import OpenAIClient, OpenAIClientError
+from summary_cache import SummaryCache, make_cache_key
+from conversion import conversion_error_message
+from jobs import JobIndex, JobQueue, JobQueueFull
+from chunked_summary import ChunkedSummarizer, REDUCE_USER_PREFIX, SummaryDeadlineExceeded, max_input_chars
+from html_extraction import extract_main_text
+from webpage_fetcher import ResponseTooLarge, WebpageFetcher
+from text_extraction import get_extraction_pool
+
+# Heavy libraries (openai, PyPDF2, python-docx, pdf2docx) are imported on first use, not at start-up.
+# Only exception classes are needed from these two, and an except clause looks them up only once something was raised.
+openai = LazyModule("openai")
+PyPDF2Errors = LazyModule("PyPDF2.errors")  # For specific PyPDF2 errors
 
 # --- Application Setup ---
+# Uploads up to this size stay in memory; larger ones spill to an anonymous temp file that vanishes on close.
+UPLOAD_SPOOL_MAX_MEMORY = int(os.environ.get("UPLOAD_SPOOL_MAX_MEMORY", 4 * 1024 * 1024))
+
+class HashingSpooledFile(tempfile.SpooledTemporaryFile):
+    """SpooledTemporaryFile that keeps a SHA-256 of everything written to it, so uploads are hashed as they arrive."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return super().write(data)
+
+class SpooledUploadRequest(Request):
+    """Request that buffers file uploads in a HashingSpooledFile sized by UPLOAD_SPOOL_MAX_MEMORY."""
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpooledFile(max_size=UPLOAD_SPOOL_MAX_MEMORY, mode="rb+")
+
 app = Flask(__name__)
+app.request_class = SpooledUploadRequest
 
 # --- Configuration ---
+# Set by gunicorn.conf.py: budgets below that are enforced per process are divided between the workers.
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", 1))
+SERVER_THREADS = int(os.environ.get("SERVER_THREADS", 1))
+
 UPLOAD_FOLDER = "uploads"
 CONVERTED_FOLDER = "converted"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(CONVERTED_FOLDER, exist_ok=True)
+
+# Uploaded PDFs and converted DOCX files: indexed, expired after ARTIFACT_TTL idle seconds and
+# LRU-evicted once they take more than ARTIFACT_MAX_BYTES in total.
+artifact_store = ArtifactStore(
+    folders={"upload": UPLOAD_FOLDER, "converted": CONVERTED_FOLDER},
+    db_path=os.environ.get("ARTIFACT_INDEX_DB", os.path.join("cache", "artifacts.sqlite3")),
+    max_bytes=int(os.environ.get("ARTIFACT_MAX_BYTES", 1024 ** 3)),
+    ttl_seconds=int(os.environ.get("ARTIFACT_TTL", 24 * 3600)),
+    sweep_interval=int(os.environ.get("ARTIFACT_SWEEP_INTERVAL", 300)),
+)
+# Hand downloads to the front-end server instead of streaming them from Python:
+# "X-Sendfile" (Apache, lighttpd) or "X-Accel-Redirect" (nginx; ARTIFACT_ACCEL_PREFIX is the internal
+# location that maps to CONVERTED_FOLDER). Otherwise send_file streams it, via sendfile() where the server supports it.
+ARTIFACT_SENDFILE_HEADER = os.environ.get("ARTIFACT_SENDFILE_HEADER", "").lower()
+ARTIFACT_ACCEL_PREFIX = os.environ.get("ARTIFACT_ACCEL_PREFIX", "/protected/converted/")
+app.config["USE_X_SENDFILE"] = ARTIFACT_SENDFILE_HEADER == "x-sendfile"
 
 app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB file size limit
-MAX_TEXT_INPUT_LENGTH = 100000  # Max chars for direct text/webpage summarization input to OpenAI
+MAX_TEXT_INPUT_LENGTH = 100000  # Max chars sent to OpenAI in one request; longer inputs are summarized in chunks
 
 # OpenAI API Key (Set in Render/Environment Variables)
-openai.api_key = os.getenv("OPENAI_API_KEY")
-if not openai.api_key:
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+if not OPENAI_API_KEY:
     app.logger.warning("OPENAI_API_KEY environment variable not set. Summarization will fail.")
 
 # Allowed file types for summarization
 ALLOWED_EXTENSIONS = {"txt", "pdf", "docx"}
 
+# Summarization model and prompts (also part of the summary cache key)
+SUMMARY_MODEL = "gpt-3.5-turbo"
+TEXT_SUMMARY_SYSTEM_PROMPT = "You are a helpful AI that summarizes text accurately and concisely."
+WEBPAGE_SUMMARY_SYSTEM_PROMPT = "You are a helpful AI that summarizes webpage content accurately and professionally and doesn't make it too short, make the summarization format like bullet points for each main idea"
+TEXT_SUMMARY_USER_PREFIX = "Please summarize the following text:\n\n"
+WEBPAGE_SUMMARY_USER_PREFIX = "Please summarize the key information from the following webpage content:\n\n"
+OPENAI_TIMEOUT = 30  # Seconds per ChatCompletion request
+
+# All OpenAI calls go through one client: RPM/TPM token buckets, retries with jittered backoff
+# (honouring Retry-After), an adaptive concurrency cap and a circuit breaker.
+# OPENAI_API_BASE (read by the openai package) points it at another server, e.g. bench/fake_openai.py.
+openai_client = OpenAIClient(
+    SUMMARY_MODEL,
+    api_key=OPENAI_API_KEY,
+    requests_per_minute=max(1, int(os.environ.get("OPENAI_RPM", 3500)) // SERVER_WORKERS),
+    tokens_per_minute=max(1, int(os.environ.get("OPENAI_TPM", 90000)) // SERVER_WORKERS),
+    max_concurrency=int(os.environ.get("OPENAI_MAX_CONCURRENCY", 16)),
+    max_retries=int(os.environ.get("OPENAI_MAX_RETRIES", 4)),
+    retry_budget=float(os.environ.get("OPENAI_RETRY_BUDGET", 60)),
+    timeout=OPENAI_TIMEOUT,
+    breaker_threshold=int(os.environ.get("OPENAI_BREAKER_THRESHOLD", 5)),
+    breaker_reset=float(os.environ.get("OPENAI_BREAKER_RESET", 30)),
+)
+
+# Summary cache: in-process LRU plus optional SQLite tier (set SUMMARY_CACHE_DB="" to disable disk)
+summary_cache = SummaryCache(
+    max_entries=int(os.environ.get("SUMMARY_CACHE_SIZE", 256)),
+    ttl_seconds=int(os.environ.get("SUMMARY_CACHE_TTL", 24 * 3600)),
+    db_path=os.environ.get("SUMMARY_CACHE_DB", os.path.join("cache", "summaries.sqlite3")) or None,
+    max_db_entries=int(os.environ.get("SUMMARY_CACHE_DB_SIZE", 10000)),
+)
+# Chunk and intermediate reduce summaries of map-reduce runs have their own cache (and SQLite file),
+# so the ~100s of entries one long document produces can't push whole-document summaries out of summary_cache.
+chunk_summary_cache = SummaryCache(
+    max_entries=int(os.environ.get("CHUNK_CACHE_SIZE", 1024)),
+    max_chars=int(os.environ.get("CHUNK_CACHE_CHARS", 4_000_000)),
+    ttl_seconds=int(os.environ.get("SUMMARY_CACHE_TTL", 24 * 3600)),
+    db_path=os.environ.get("CHUNK_CACHE_DB", os.path.join("cache", "chunk_summaries.sqlite3")) or None,
+    max_db_entries=int(os.environ.get("CHUNK_CACHE_DB_SIZE", 50000)),
+)
+
+# Map-reduce summarization for inputs longer than MAX_TEXT_INPUT_LENGTH
+SUMMARY_CHUNK_TOKENS = int(os.environ.get("SUMMARY_CHUNK_TOKENS", 3000))
+SUMMARY_CHUNK_WORKERS = int(os.environ.get("SUMMARY_CHUNK_WORKERS", 4))
+# Seconds one request may spend on map-reduce calls; a run that gets there fails with 503 instead of
+# holding its thread. Longer inputs than this worker's TPM share can summarize in that time are refused (413).
+SUMMARY_TIME_BUDGET = float(os.environ.get("SUMMARY_TIME_BUDGET", 120))
+SUMMARY_BUSY_MESSAGE = "The summarization service is too busy to finish this document in time. Please try again later."
+MAX_SUMMARY_INPUT_LENGTH = int(os.environ.get("MAX_SUMMARY_INPUT_LENGTH", max(MAX_TEXT_INPUT_LENGTH, max_input_chars(
+    openai_client.token_bucket.rate * SUMMARY_TIME_BUDGET, SUMMARY_CHUNK_TOKENS, openai_client.reply_token_allowance))))
+# Longest a summary stream goes without writing to the client (a keep-alive comment if nothing else is due),
+# so a disconnect is noticed and its map-reduce calls are stopped.
+SSE_HEARTBEAT_INTERVAL = float(os.environ.get("SSE_HEARTBEAT_INTERVAL", 10))
+
+# Webpage fetching: shared keep-alive session, download ceiling, HTTP cache and extracted-text cache
+WEB_FETCH_MAX_BYTES = int(os.environ.get("WEB_FETCH_MAX_BYTES", 5 * 1024 * 1024))
+webpage_fetcher = WebpageFetcher(
+    timeout=int(os.environ.get("WEB_FETCH_TIMEOUT", 15)),
+    max_bytes=WEB_FETCH_MAX_BYTES,
+    pool_connections=int(os.environ.get("WEB_FETCH_POOL_HOSTS", 10)),
+    pool_maxsize=int(os.environ.get("WEB_FETCH_POOL_SIZE", max(10, SERVER_THREADS))),
+    http_cache_bytes=int(os.environ.get("WEB_HTTP_CACHE_BYTES", 50 * 1024 * 1024)),
+    text_cache_ttl=int(os.environ.get("WEBPAGE_TEXT_CACHE_TTL", 600)),
+)
+HTML_EXTRACT_BACKEND = os.environ.get("HTML_EXTRACT_BACKEND", "auto")  # auto, selectolax, lxml or bs4
+
+# PDF->DOCX conversions run in this process pool (mode=job returns at once, otherwise the request waits).
+# Job status and in-progress conversions are recorded next to the artifact index, so every worker can
+# answer /jobs/<id> polls and join an identical conversion started by another worker.
+CONVERSION_JOB_TTL = int(os.environ.get("CONVERSION_JOB_TTL", 3600))
+conversion_index = JobIndex(artifact_store.db_path, ttl=CONVERSION_JOB_TTL)
+conversion_jobs = JobQueue(
+    max_workers=int(os.environ.get("CONVERSION_WORKERS", 2)),
+    max_pending=int(os.environ.get("CONVERSION_QUEUE_DEPTH", 8)),
+    result_ttl=CONVERSION_JOB_TTL,
+    index=conversion_index,
+)
+JOB_RETRY_AFTER_SECONDS = 10
+# PDF->DOCX conversions cover this page range; identical uploads (same SHA-256 and range) reuse one DOCX.
+CONVERSION_START_PAGE = 0
+CONVERSION_END_PAGE = 10
+CONVERSION_WAIT_TIMEOUT = float(os.environ.get("CONVERSION_WAIT_TIMEOUT", 300))  # Seconds a synchronous request waits for its conversion
+
+# Batch summarization (/summarize_batch): items per request and how many are processed at once
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", 200))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 8))
+
+# Document text extraction budgets (PDF pages are extracted in parallel across a process pool)
+PDF_MAX_PAGES = int(os.environ.get("PDF_MAX_PAGES", 500))
+PDF_EXTRACT_DEADLINE = float(os.environ.get("PDF_EXTRACT_DEADLINE", 20))  # Seconds
+PDF_EXTRACT_WORKERS = int(os.environ.get("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+DOCX_MAX_CHARS = int(os.environ.get("DOCX_MAX_CHARS", 1000000))
+
+# --- Metrics ---
+# Prometheus metrics on /metrics; SERVER_TIMING=true also adds a per-request Server-Timing header.
+# METRICS_DIR (set by gunicorn.conf.py) is where workers share their metrics so that any of them can answer a scrape.
+metrics.init_app(app, server_timing=os.environ.get("SERVER_TIMING", "False").lower() == "true",
+                 snapshot_dir=os.environ.get("METRICS_DIR") or None)
+metrics.registry.counter_callback("summary_cache_events", "Summary cache lookups and stores since start.",
+                                  lambda: {k: v for k, v in summary_cache.stats().items()
+                                           if k in ("memory_hits", "disk_hits", "misses", "stores", "evictions", "expired")},
+                                  ("event",))
+metrics.registry.gauge_callback("summary_cache_entries", "Entries in the in-memory summary cache.",
+                                lambda: summary_cache.stats()["entries"])
+metrics.registry.counter_callback("chunk_summary_cache_events", "Chunk summary cache lookups and stores since start.",
+                                  lambda: {k: v for k, v in chunk_summary_cache.stats().items()
+                                           if k in ("memory_hits", "disk_hits", "misses", "stores", "evictions", "expired")},
+                                  ("event",))
+metrics.registry.gauge_callback("chunk_summary_cache_entries", "Entries in the in-memory chunk summary cache.",
+                                lambda: chunk_summary_cache.stats()["entries"])
+metrics.registry.gauge_callback("artifact_store_bytes", "Bytes held in the artifact store by kind.",
+                                lambda: artifact_store.stats()["bytes"], ("kind",), mode="max")
+metrics.registry.gauge_callback("artifact_store_files", "Files held in the artifact store by kind.",
+                                lambda: artifact_store.stats()["files"], ("kind",), mode="max")
+metrics.registry.counter_callback("artifact_store_removals", "Artifacts removed, by reason.",
+                                  lambda: {k: v for k, v in artifact_store.stats().items()
+                                           if k in ("expired", "evicted", "deleted")},
+                                  ("reason",))
+metrics.registry.counter_callback("openai_client_events", "OpenAI client calls, retries, 429s and locally rejected calls.",
+                                  lambda: {k: v for k, v in openai_client.stats().items()
+                                           if k in ("calls", "retries", "throttled", "rejected")},
+                                  ("event",))
+metrics.registry.gauge_callback("openai_concurrency_limit", "Current adaptive caps on concurrent OpenAI calls, summed over workers.",
+                                lambda: openai_client.stats()["limit"])
+metrics.registry.gauge_callback("openai_circuit_open", "1 while the OpenAI circuit breaker rejects calls.",
+                                lambda: int(openai_client.stats()["breaker"] == "open"), mode="max")
+metrics.registry.gauge_callback("conversion_jobs_pending", "Conversion jobs queued or running.",
+                                lambda: conversion_jobs.stats()["pending"])
+
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # --- Helper Functions ---
+def request_chat_completion(system_prompt, user_content):
+    """Run one OpenAI chat completion (with retries) and return the reply text. OpenAI/requests errors propagate."""
+    started = time.perf_counter()
+    try:
+        return openai_client.complete(system_prompt, user_content)
+    except (openai.error.OpenAIError, OpenAIClientError, requests.exceptions.RequestException) as e:
+        metrics.record_openai_error(e)
+        raise
+    finally:
+        metrics.openai_request_duration.observe(time.perf_counter() - started, mode="sync")
+
+def stream_chat_completion(system_prompt, user_content):
+    """Yield reply text fragments from a streaming OpenAI chat completion as they arrive."""
+    started = time.perf_counter()
+    fragments = openai_client.stream(system_prompt, user_content)
+    try:
+        yield from fragments
+    except (openai.error.OpenAIError, OpenAIClientError, requests.exceptions.RequestException) as e:
+        metrics.record_openai_error(e)
+        raise
+    finally:
+        metrics.openai_request_duration.observe(time.perf_counter() - started, mode="stream")
+        fragments.close()  # Closes the upstream stream if our consumer went away
+
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+chunked_summarizer = ChunkedSummarizer(
+    request_chat_completion, chunk_summary_cache, SUMMARY_MODEL,
+    chunk_tokens=SUMMARY_CHUNK_TOKENS, max_workers=SUMMARY_CHUNK_WORKERS,
+)
+
+def reduce_partials_events(text, cancel):
+    """
+    SSE generator for the map-reduce levels of a streamed summary, which run on a helper thread:
+    yields a 'status' event as each section finishes and a keep-alive comment when none has for
+    SSE_HEARTBEAT_INTERVAL, so a failed write (client gone) surfaces here. The caller sets cancel
+    when that happens. Returns the input for the final pass; errors from the run are re-raised.
+    """
+    updates = queue.Queue()
+
+    def progress(level, done, total):
+        updates.put(("status", f"Summarized {done} of {total} sections..." if level == 0
+                     else f"Combining section summaries ({done} of {total})..."))
+
+    def run():
+        try:
+            updates.put(("result", chunked_summarizer.reduce_partials(text, summary_deadline(), cancel, progress)))
+        except Exception as e:
+            updates.put(("error", e))
+
+    threading.Thread(target=run, name="summary-map-reduce", daemon=True).start()
+    while True:
+        try:
+            kind, value = updates.get(timeout=SSE_HEARTBEAT_INTERVAL)
+        except queue.Empty:
+            yield ": keep-alive\n\n"
+            continue
+        if kind == "status":
+            yield sse_event("status", {"message": value})
+        elif kind == "error":
+            raise value
+        else:
+            return value
+
 def allowed_file(filename):
     """Check if file is allowed based on extension."""
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -46,41 +300,46 @@ def generate_unique_filename(original_filename):
     return f"{secure_name_part}_{uuid.uuid4().hex}{ext}"
 
 
-def extract_text_from_file(file_path):
+def extract_text_from_file(source, filename=None):
     """
-    Extract text from the uploaded file.
-    - PDFs: First 10 pages.
-    - DOCX: First 10 paragraphs (Note: this is different from PDF's page-based limit).
+    Extract text from an uploaded document.
+    - source: a path or a binary file object (uploads are read straight from their in-memory spool).
+    - filename: used to pick the format; defaults to source when it is a path.
+    - PDFs: Up to PDF_MAX_PAGES pages, extracted in parallel, within PDF_EXTRACT_DEADLINE seconds.
+    - DOCX: Paragraphs in document order, up to DOCX_MAX_CHARS characters.
     - TXT: Full content, attempts UTF-8 then latin-1 encoding.
     Returns extracted text or None on failure.
     """
     extracted_text = ""
-    filename = os.path.basename(file_path) 
+    filename = os.path.basename(filename or source)
+    extension = os.path.splitext(filename)[1].lower()
 
     try:
-        if file_path.endswith(".txt"):
+        if extension == ".txt":
+            try:
+                if hasattr(source, "read"):
+                    source.seek(0)
+                    raw = source.read()
+                else:
+                    with open(source, "rb") as f:
+                        raw = f.read()
+            except Exception as e_read:
+                app.logger.error(f"Failed to read TXT file {filename}: {e_read}")
+                return None
             try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    extracted_text = f.read()
+                extracted_text = raw.decode("utf-8")
             except UnicodeDecodeError:
                 app.logger.warning(f"UTF-8 decoding failed for {filename}. Trying latin-1.")
-                try:
-                    with open(file_path, "r", encoding="latin-1") as f: 
-                        extracted_text = f.read()
-                except Exception as e_latin1:
-                    app.logger.error(f"Failed to read TXT file {filename} with fallback encoding: {e_latin1}")
-                    return None 
-            except Exception as e_utf8:
-                app.logger.error(f"Failed to read TXT file {filename}: {e_utf8}")
-                return None
+                extracted_text = raw.decode("latin-1")
 
-        elif file_path.endswith(".pdf"):
+        elif extension == ".pdf":
             try:
-                reader = PdfReader(file_path)
-                for i in range(min(10, len(reader.pages))):
-                    page_text = reader.pages[i].extract_text()
-                    if page_text:
-                        extracted_text += page_text + "\n"
+                extracted_text = document_handlers.get_extractor(extension)(
+                    source,
+                    max_pages=PDF_MAX_PAGES,
+                    deadline_seconds=PDF_EXTRACT_DEADLINE,
+                    executor=get_extraction_pool(PDF_EXTRACT_WORKERS),
+                )
             except PyPDF2Errors.PdfReadError as e_pdf_read: 
                 app.logger.error(f"Error reading PDF file {filename} (possibly corrupted or password-protected): {e_pdf_read}")
                 return None
@@ -88,92 +347,138 @@ def extract_text_from_file(file_path):
                 app.logger.error(f"Error processing PDF file {filename}: {e_pdf}")
                 return None
 
-        elif file_path.endswith(".docx"):
+        elif extension == ".docx":
             try:
-                doc = Document(file_path)
-                # Note: Extracts first 10 paragraphs, differing from PDF's page-based handling.
-                extracted_text = "\n".join([para.text for para in doc.paragraphs[:10]])
+                extracted_text = document_handlers.get_extractor(extension)(source, max_chars=DOCX_MAX_CHARS)
             except Exception as e_docx: 
                 app.logger.error(f"Error processing DOCX file {filename} (possibly corrupted): {e_docx}")
                 return None
         
         extracted_text = ' '.join(extracted_text.split()) # Normalize whitespace
+        metrics.record_extracted(len(extracted_text), source=extension.lstrip("."))
         # Optional: Truncate very long extracted texts further if needed before summarization input limit
         # if len(extracted_text) > SOME_ABSOLUTE_MAX_INTERNAL_LENGTH:
         #     extracted_text = extracted_text[:SOME_ABSOLUTE_MAX_INTERNAL_LENGTH]
 
     except Exception as e:
-        app.logger.error(f"General error extracting text from {file_path}: {e}")
+        app.logger.error(f"General error extracting text from {filename}: {e}")
         return None 
 
     return extracted_text
 
+def upload_digest(file):
+    """SHA-256 hex digest of an upload, computed while it was spooled (or now, for other stream types)."""
+    sha256 = getattr(file.stream, "sha256", None)
+    if sha256 is None:
+        sha256 = hashlib.sha256()
+        file.stream.seek(0)
+        for block in iter(lambda: file.stream.read(1024 * 1024), b""):
+            sha256.update(block)
+        file.stream.seek(0)
+    return sha256.hexdigest()
+
+def input_too_long_message(length):
+    return (f"The text is too long to summarize ({length} characters; the limit is {MAX_SUMMARY_INPUT_LENGTH}). "
+            "Please submit a shorter document.")
+
+def summary_deadline():
+    """Deadline (time.monotonic()) for the map-reduce calls of a summary starting now."""
+    return time.monotonic() + SUMMARY_TIME_BUDGET
+
+def stream_size(stream):
+    """Size in bytes of a seekable upload stream (e.g. a FileStorage's spooled stream); leaves it rewound."""
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
 # --- Routes ---
 @app.route("/")
 def index():
     """Render the main webpage."""
     return render_template("index.html")
 
-@app.route("/summarize", methods=["POST"])
-def summarize():
-    """AI Summarization Route"""
-    text_to_summarize = request.form.get("text", "")
-    file = request.files.get("file")
+def get_summarize_input():
+    """
+    Read the text to summarize from the request (form text or an uploaded file).
+    Returns (text, source_description, None), or (None, None, error_response) when the input is unusable.
+    """
+    with metrics.stage("receive"):  # Form parsing spools any upload into memory (or an anonymous temp file)
+        text_to_summarize = request.form.get("text", "")
+        file = request.files.get("file")
     source_description = "direct text input"
 
     if file:
         if not file.filename: # Check if a file was selected but no filename (e.g. empty input)
-             return jsonify({"error": "No file selected or file has no name."}), 400
+             return None, None, (jsonify({"error": "No file selected or file has no name."}), 400)
         if not allowed_file(file.filename):
-            return jsonify({"error": f"File type '{file.filename.rsplit('.', 1)[1]}' not allowed for summarization."}), 400
+            return None, None, (jsonify({"error": f"File type '{file.filename.rsplit('.', 1)[1]}' not allowed for summarization."}), 400)
         
         original_filename = file.filename
-        unique_filename = generate_unique_filename(original_filename)
-        file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-        
+
+        # Summarization inputs are never written to UPLOAD_FOLDER: text is extracted from the spooled upload.
         try:
-            file.save(file_path)
+            size = stream_size(file.stream)
+            metrics.record_upload(size)
             source_description = f"file: {original_filename}"
-            app.logger.info(f"File {original_filename} saved as {unique_filename} for summarization.")
+            app.logger.info(f"File {original_filename} received ({size} bytes) for summarization.")
             
-            text_to_summarize = extract_text_from_file(file_path)
+            with metrics.stage("extract"):
+                text_to_summarize = extract_text_from_file(file.stream, original_filename)
             if text_to_summarize is None: 
                 app.logger.error(f"Text extraction failed for {original_filename}.")
-                return jsonify({"error": "Unable to extract text from the file. The file might be corrupted, password-protected, or in an unsupported format."}), 400
+                return None, None, (jsonify({"error": "Unable to extract text from the file. The file might be corrupted, password-protected, or in an unsupported format."}), 400)
             if not text_to_summarize.strip():
                 app.logger.warning(f"No text extracted from {original_filename} or extracted text is empty.")
-                return jsonify({"error": "No content found in the file after extraction."}), 400
-        except Exception as e: # Catch errors during file save or text extraction call
-            app.logger.error(f"Error saving or processing uploaded file {original_filename}: {e}")
-            return jsonify({"error": "Error processing uploaded file."}), 500
+                return None, None, (jsonify({"error": "No content found in the file after extraction."}), 400)
+        except Exception as e: # Catch errors while reading the upload or during text extraction
+            app.logger.error(f"Error processing uploaded file {original_filename}: {e}")
+            return None, None, (jsonify({"error": "Error processing uploaded file."}), 500)
 
     if not text_to_summarize.strip(): 
-        return jsonify({"error": "No text provided for summarization."}), 400
+        return None, None, (jsonify({"error": "No text provided for summarization."}), 400)
+
+    if len(text_to_summarize) > MAX_SUMMARY_INPUT_LENGTH:
+        app.logger.warning(f"Input text from {source_description} for summarization exceeds {MAX_SUMMARY_INPUT_LENGTH} characters. Refusing it.")
+        return None, None, (jsonify({"error": input_too_long_message(len(text_to_summarize))}), 413)
+
+    return text_to_summarize, source_description, None
+
+
+@app.route("/summarize", methods=["POST"])
+def summarize():
+    """AI Summarization Route"""
+    text_to_summarize, source_description, error_response = get_summarize_input()
+    if error_response:
+        return error_response
 
-    if len(text_to_summarize) > MAX_TEXT_INPUT_LENGTH:
-        app.logger.warning(f"Input text from {source_description} for summarization exceeds {MAX_TEXT_INPUT_LENGTH} characters. Truncating.")
-        text_to_summarize = text_to_summarize[:MAX_TEXT_INPUT_LENGTH]
+    cache_key = make_cache_key(text_to_summarize, SUMMARY_MODEL, TEXT_SUMMARY_SYSTEM_PROMPT)
+    cached_summary = summary_cache.get(cache_key)
+    if cached_summary is not None:
+        app.logger.info(f"Summary cache hit for content from {source_description}.")
+        return jsonify({"summary": cached_summary, "cached": True})
 
-    if not openai.api_key:
+    if not OPENAI_API_KEY:
         app.logger.error("OpenAI API key not configured.")
         return jsonify({"error": "Summarization service is not configured. Administrator intervention required."}), 503
 
     try:
         app.logger.info(f"Requesting summarization from OpenAI for content from {source_description} (length: {len(text_to_summarize)} chars).")
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful AI that summarizes text accurately and concisely."},
-                {"role": "user", "content": f"Please summarize the following text:\n\n{text_to_summarize}"}
-            ],
-            timeout=30 
-        )
-        summary = response.choices[0].message.content.strip()
+        with metrics.stage("llm"):
+            if len(text_to_summarize) > MAX_TEXT_INPUT_LENGTH:
+                app.logger.info(f"Input from {source_description} exceeds {MAX_TEXT_INPUT_LENGTH} characters. Using chunked summarization.")
+                summary = chunked_summarizer.summarize(text_to_summarize, TEXT_SUMMARY_SYSTEM_PROMPT, summary_deadline())
+            else:
+                summary = request_chat_completion(TEXT_SUMMARY_SYSTEM_PROMPT, TEXT_SUMMARY_USER_PREFIX + text_to_summarize)
+        summary_cache.set(cache_key, summary)
         app.logger.info(f"Summarization successful for content from {source_description}.")
         return jsonify({"summary": summary})
-    except openai.error.OpenAIError as e_openai: 
+    except (openai.error.OpenAIError, OpenAIClientError) as e_openai: 
         app.logger.error(f"OpenAI API error during summarization for {source_description}: {e_openai}")
         return jsonify({"error": f"Summarization service error: {type(e_openai).__name__}. Please try again later."}), 503 
+    except SummaryDeadlineExceeded:
+        app.logger.error(f"Summarization of content from {source_description} ran out of its {SUMMARY_TIME_BUDGET:.0f}s budget.")
+        return jsonify({"error": SUMMARY_BUSY_MESSAGE}), 503
     except requests.exceptions.Timeout:
         app.logger.error(f"OpenAI API call timed out for {source_description}.")
         return jsonify({"error": "Summarization service timed out. Please try again later."}), 504 
@@ -182,9 +487,82 @@ def summarize():
         return jsonify({"error": "An unexpected error occurred during summarization."}), 500
 
 
+def store_conversion_result(pdf_name, docx_name, download_name, succeeded, content_key=None):
+    """
+    Index the converted DOCX (under content_key, for reuse) and delete the input PDF once a conversion has succeeded.
+    On failure the partial output is removed and the input is left to the store's TTL.
+    Returns True if the DOCX is available for download.
+    """
+    if succeeded and os.path.exists(artifact_store.path("converted", docx_name)):
+        artifact_store.register("converted", docx_name, download_name, content_key=content_key)
+        artifact_store.delete("upload", pdf_name)
+        return True
+    artifact_store.delete("converted", docx_name)
+    artifact_store.unpin("upload", pdf_name)
+    return False
+
+
+def conversion_download_url(docx_name, download_name):
+    return url_for("download_file", filename_internal=docx_name, filename_original=download_name, _external=True)
+
+
+# --- Conversion deduplication ---
+# The first request for a content key claims it in conversion_index (shared by all workers) and runs the
+# conversion; identical requests arriving meanwhile, in any worker, follow the job attached to that claim.
+
+def conversion_job_response(job_id, original_filename):
+    return jsonify({
+        "job_id": job_id,
+        "status_url": url_for("job_status", job_id=job_id, _external=True),
+        "message": f"Conversion of '{original_filename}' queued.",
+    }), 202
+
+def conversion_outcome(job):
+    """For a finished conversion job: (docx_name, None) if its DOCX is available, else (None, (error_message, status))."""
+    if job["status"] == "done":
+        docx_name = job["meta"]["filename_internal"]
+        if artifact_store.lookup("converted", docx_name, touch=False) is not None:
+            return docx_name, None
+        return None, ("File conversion process failed to create output file.", 500)
+    return None, conversion_error_message(job["error"])
+
+def wait_for_conversion(job_id, original_filename, download_name):
+    """Block the request thread (not the CPU) until the conversion job finishes, then answer with its outcome."""
+    with metrics.stage("convert"):
+        job = conversion_jobs.wait(job_id, CONVERSION_WAIT_TIMEOUT)
+    if job is None:
+        return jsonify({"error": "Error processing uploaded file."}), 500
+    if job["finished_at"] is None:
+        return jsonify({"error": "Timed out waiting for the conversion to finish. Please try again."}), 504
+    docx_name, error = conversion_outcome(job)
+    if docx_name is None:
+        error_message, status = error
+        return jsonify({"error": error_message}), status
+    return jsonify({"download_url": conversion_download_url(docx_name, download_name),
+                    "message": f"Successfully converted '{original_filename}'."})
+
+def follow_conversion(job_id, wants_job, original_filename, download_name):
+    """Answer a request whose identical conversion is already running: share its job, or wait for its result."""
+    metrics.conversion_dedup.inc(outcome="joined")
+    if job_id is None:
+        return jsonify({"error": "Timed out waiting for the conversion to start. Please try again."}), 504
+    if wants_job:
+        app.logger.info(f"Conversion of {original_filename} joined in-flight job {job_id}.")
+        return conversion_job_response(job_id, original_filename)
+    app.logger.info(f"Conversion of {original_filename} is waiting for in-flight job {job_id}.")
+    return wait_for_conversion(job_id, original_filename, download_name)
+
+
 @app.route("/convert_pdf_to_word", methods=["POST"])
 def convert_pdf_to_word():
-    """Convert uploaded PDF to Word (only first 10 pages)."""
+    """
+    Convert uploaded PDF to Word (only first 10 pages).
+    Conversions run in the background process pool; 429 when its queue is full.
+    With mode=job (query or form field) returns 202 with a job id to poll at /jobs/<id>,
+    otherwise waits for the DOCX and returns its download URL.
+    A PDF that was already converted is answered straight away with the existing DOCX,
+    and identical uploads arriving while it is being converted wait for that conversion.
+    """
     if "pdf-file" not in request.files:
         return jsonify({"error": "No PDF file part in the request."}), 400
 
@@ -196,54 +574,113 @@ def convert_pdf_to_word():
         return jsonify({"error": "Uploaded file is not a PDF."}), 400
 
     original_filename = pdf_file.filename
-    unique_pdf_filename = generate_unique_filename(original_filename)
-    pdf_path = os.path.join(UPLOAD_FOLDER, unique_pdf_filename)
-
     original_name_no_ext, _ = os.path.splitext(secure_filename(original_filename))
     desired_download_name = original_name_no_ext + ".docx"
-    
+    wants_job = (request.args.get("mode") or request.form.get("mode", "")).lower() == "job"
+
+    content_key = f"{upload_digest(pdf_file)}:{CONVERSION_START_PAGE}:{CONVERSION_END_PAGE}"
+    existing = artifact_store.find("converted", content_key)
+    if existing is not None:
+        metrics.conversion_dedup.inc(outcome="reused")
+        app.logger.info(f"PDF {original_filename} was already converted; reusing {existing['name']}.")
+        return jsonify({"download_url": conversion_download_url(existing["name"], desired_download_name),
+                        "message": f"Successfully converted '{original_filename}'."})
+
+    # Waits (briefly, in practice) while another request that owns the claim saves its upload and queues the job.
+    claim_id, job_id = conversion_index.claim(content_key, timeout=CONVERSION_WAIT_TIMEOUT)
+    if claim_id is None:
+        return follow_conversion(job_id, wants_job, original_filename, desired_download_name)
+    metrics.conversion_dedup.inc(outcome="converted")
+    try:
+        return start_conversion(pdf_file, content_key, claim_id, wants_job, desired_download_name)
+    except BaseException:
+        conversion_index.release(content_key, claim_id)
+        raise
+
+
+def start_conversion(pdf_file, content_key, claim_id, wants_job, desired_download_name):
+    """
+    Save an upload and queue its conversion on the process pool, attaching the job to the content key's claim
+    (which is released once the DOCX is stored). Synchronous requests then wait for the result; the conversion
+    itself never runs in a request thread.
+    """
+    original_filename = pdf_file.filename
+    unique_pdf_filename = generate_unique_filename(original_filename)
+    pdf_path = artifact_store.path("upload", unique_pdf_filename)
     unique_docx_internal_name = os.path.splitext(unique_pdf_filename)[0] + ".docx"
-    docx_path = os.path.join(CONVERTED_FOLDER, unique_docx_internal_name)
+    docx_path = artifact_store.path("converted", unique_docx_internal_name)
 
-    converter = None
     try:
-        pdf_file.save(pdf_path)
+        with metrics.stage("save"):
+            pdf_file.save(pdf_path)
+        # Pinned so quota eviction can't take the input away while it is being converted.
+        metrics.record_upload(artifact_store.register("upload", unique_pdf_filename, original_filename, pinned=True))
         app.logger.info(f"PDF file {original_filename} saved as {unique_pdf_filename} for conversion.")
+    except Exception as e:
+        app.logger.error(f"Error saving uploaded PDF {original_filename}: {e}")
+        conversion_index.release(content_key, claim_id)
+        return jsonify({"error": "Error processing uploaded file."}), 500
 
-        converter = Converter(pdf_path)
-        converter.convert(docx_path, start=0, end=10)  
-        
-        app.logger.info(f"PDF {unique_pdf_filename} converted to DOCX {unique_docx_internal_name}.")
-
-        if not os.path.exists(docx_path):
+    def on_job_finish(job):
+        if store_conversion_result(unique_pdf_filename, unique_docx_internal_name, desired_download_name,
+                                   job["status"] == "done", content_key):
+            app.logger.info(f"PDF {unique_pdf_filename} converted to DOCX {unique_docx_internal_name}.")
+        elif job["error"] is not None:
+            app.logger.error(f"Error during PDF to Word conversion for {original_filename} (saved as {unique_pdf_filename}): {job['error']}")
+        else:
             app.logger.error(f"File conversion failed for {unique_pdf_filename}, DOCX not found at {docx_path}.")
-            return jsonify({"error": "File conversion process failed to create output file."}), 500
-        
-        download_url = url_for("download_file", 
-                               filename_internal=unique_docx_internal_name, 
-                               filename_original=desired_download_name, 
-                               _external=True)
-        return jsonify({"download_url": download_url, "message": f"Successfully converted '{original_filename}'."})
+        conversion_index.release(content_key, claim_id)
 
-    except Exception as e:
-        app.logger.error(f"Error during PDF to Word conversion for {original_filename} (saved as {unique_pdf_filename}): {e}")
-        # Check if it's a known pdf2docx issue (e.g. password protected)
-        if "wrong password" in str(e).lower() or "password required" in str(e).lower():
-             return jsonify({"error": "Conversion error: The PDF might be password-protected."}), 400
-        return jsonify({"error": f"Conversion error: {str(e)}"}), 500
-    finally:
-        if converter:
-            try:
-                converter.close()
-            except Exception as e_close: 
-                app.logger.error(f"Error closing PDF converter for {unique_pdf_filename}: {e_close}")
-        # For production: consider deleting pdf_path here if conversion was successful and it's no longer needed.
-        # if os.path.exists(pdf_path):
-        #     try:
-        #         os.remove(pdf_path)
-        #         app.logger.info(f"Cleaned up uploaded PDF: {pdf_path}")
-        #     except OSError as e_remove:
-        #         app.logger.error(f"Error removing uploaded PDF {pdf_path}: {e_remove}")
+    try:
+        with metrics.stage("enqueue"):
+            job_id = conversion_jobs.submit(
+                document_handlers.get_converter(".pdf", ".docx").load(), pdf_path, docx_path, start=CONVERSION_START_PAGE, end=CONVERSION_END_PAGE,
+                meta={"filename_internal": unique_docx_internal_name,
+                      "filename_original": desired_download_name,
+                      "source": original_filename},
+                on_finish=on_job_finish,
+            )
+    except JobQueueFull as e_full:
+        app.logger.warning(f"Conversion queue saturated, rejecting {original_filename}: {e_full}")
+        artifact_store.delete("upload", unique_pdf_filename)
+        conversion_index.release(content_key, claim_id)
+        response = jsonify({"error": "The conversion service is busy. Please try again shortly."})
+        response.headers["Retry-After"] = str(JOB_RETRY_AFTER_SECONDS)
+        return response, 429
+    except Exception as e_submit:
+        app.logger.error(f"Could not queue conversion of {original_filename}: {e_submit}")
+        artifact_store.delete("upload", unique_pdf_filename)
+        conversion_index.release(content_key, claim_id)
+        return jsonify({"error": "Error processing uploaded file."}), 500
+    conversion_index.attach(content_key, claim_id, job_id)
+    app.logger.info(f"Queued conversion job {job_id} for {unique_pdf_filename}.")
+
+    if wants_job:
+        return conversion_job_response(job_id, original_filename)
+    return wait_for_conversion(job_id, original_filename, desired_download_name)
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    """Report status and progress of a background conversion job."""
+    job = conversion_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired."}), 404
+
+    payload = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "message": job["message"],
+    }
+    if job["finished_at"] is not None:
+        docx_name, error = conversion_outcome(job)
+        if docx_name is not None:
+            payload["download_url"] = conversion_download_url(docx_name, job["meta"]["filename_original"])
+        else:
+            payload["status"] = "failed"
+            payload["error"], _ = error
+    return jsonify(payload)
 
 
 @app.route("/download/<path:filename_internal>") 
@@ -254,74 +691,56 @@ def download_file(filename_internal):
         app.logger.warning(f"Download attempt with potentially unsafe filename: '{filename_internal}' sanitized to '{safe_internal_filename}'")
         return jsonify({"error": "Invalid filename."}), 400
 
-    # Resolve paths carefully
-    base_dir = os.path.abspath(os.path.dirname(__file__))
-    converted_folder_abs = os.path.abspath(os.path.join(base_dir, CONVERTED_FOLDER))
-    target_path = os.path.abspath(os.path.join(converted_folder_abs, safe_internal_filename))
+    # Only files indexed by the artifact store are served, so nothing outside CONVERTED_FOLDER can be reached.
+    artifact = artifact_store.lookup("converted", safe_internal_filename)
+    if artifact is None:
+        app.logger.warning(f"Download request for unknown or expired file: '{safe_internal_filename}'")
+        return jsonify({"error": "File not found or no longer available."}), 404
 
-    # Security check: Ensure the resolved path is strictly within the CONVERTED_FOLDER
-    if not target_path.startswith(converted_folder_abs + os.sep): # os.sep for platform independence
-        app.logger.error(f"Attempt to download file outside designated folder: {safe_internal_filename} resolved to {target_path}")
-        return jsonify({"error": "Access denied or file not found."}), 404
+    filename_original_query = request.args.get("filename_original") or artifact["original_name"] or safe_internal_filename
+    safe_original_filename_download = secure_filename(filename_original_query)
 
-    if os.path.exists(target_path) and os.path.isfile(target_path):
-        filename_original_query = request.args.get("filename_original", safe_internal_filename)
-        safe_original_filename_download = secure_filename(filename_original_query)
-
-        app.logger.info(f"Serving file '{safe_internal_filename}' for download as '{safe_original_filename_download}'.")
-        return send_file(target_path, as_attachment=True, download_name=safe_original_filename_download)
-    else:
-        app.logger.warning(f"Download request for non-existent or non-file path: '{safe_internal_filename}' (resolved to '{target_path}')")
-        return jsonify({"error": "File not found or no longer available."}), 404
+    app.logger.info(f"Serving file '{safe_internal_filename}' for download as '{safe_original_filename_download}'.")
+    with metrics.stage("send"):
+        if ARTIFACT_SENDFILE_HEADER == "x-accel-redirect":
+            response = Response(mimetype=mimetypes.guess_type(safe_original_filename_download)[0] or "application/octet-stream")
+            response.headers["X-Accel-Redirect"] = ARTIFACT_ACCEL_PREFIX + safe_internal_filename
+            response.headers.set("Content-Disposition", "attachment", filename=safe_original_filename_download)
+            return response
+        return send_file(artifact["path"], as_attachment=True, download_name=safe_original_filename_download)
 
 
 def extract_text_from_webpage(url):
     """
     Fetch and extract readable text from a webpage.
-    Note: Robust webpage text extraction is complex. This is a basic implementation.
+    Note: Robust webpage text extraction is complex. This is a basic implementation
+    (see html_extraction for the parser backends).
     Consider libraries like Trafilatura or Newspaper3k for more advanced needs.
     Returns (text, error_message_or_none)
     """
-    try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        response = requests.get(url, headers=headers, timeout=15) 
-        response.raise_for_status() 
+    cached_text = webpage_fetcher.get_text(url)
+    if cached_text is not None:
+        app.logger.info(f"Using cached extracted text for webpage: {url}")
+        return cached_text, None
 
-        response.encoding = response.apparent_encoding or "utf-8"
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        for script_or_style in soup(["script", "style", "header", "footer", "nav", "aside"]): # Remove common non-content tags
-            script_or_style.decompose()
-        
-        # Basic attempt to find main content (can be improved)
-        texts = []
-        main_selectors = ['article', 'main', '.main-content', '#content', '.entry-content', '.post-body']
-        content_area = None
-        for selector in main_selectors:
-            if soup.select_one(selector):
-                content_area = soup.select_one(selector)
-                break
-        
-        target_element = content_area if content_area else soup.body # Fallback to body
-        
-        if target_element:
-            paragraphs = target_element.find_all("p", recursive=True) # Get all p tags within target
-            if paragraphs:
-                for para in paragraphs:
-                    texts.append(para.get_text(separator=" ", strip=True))
-            else: # If no <p>, get all text from the target_element
-                texts.append(target_element.get_text(separator=" ", strip=True))
-        
-        text_content = "\n".join(filter(None, texts)) # Join non-empty lines
-        text_content = ' '.join(text_content.split()) # Normalize whitespace
+    try:
+        with metrics.stage("fetch"):
+            page = webpage_fetcher.fetch(url)
+        with metrics.stage("extract"):
+            text_content = extract_main_text(page.text, backend=HTML_EXTRACT_BACKEND)
+        metrics.record_extracted(len(text_content), source="webpage")
 
         if not text_content.strip():
              app.logger.warning(f"No meaningful text extracted from webpage: {url} after parsing.")
              # No error message, but empty text
 
-        return text_content.strip(), None 
+        text_content = text_content.strip()
+        if text_content:
+            webpage_fetcher.set_text(url, text_content)
+        return text_content, None 
+    except ResponseTooLarge:
+        app.logger.error(f"Webpage {url} exceeds the {WEB_FETCH_MAX_BYTES} byte download limit.")
+        return None, f"Failed to fetch webpage: Page is larger than {WEB_FETCH_MAX_BYTES // (1024 * 1024)}MB."
     except requests.exceptions.Timeout:
         app.logger.error(f"Timeout fetching webpage {url}.")
         return None, "Failed to fetch webpage: Connection timed out."
@@ -333,55 +752,74 @@ def extract_text_from_webpage(url):
         return None, f"Failed to extract content due to an unexpected error: {str(e)}"
 
 
-@app.route("/summarize_webpage", methods=["POST"])
-def summarize_webpage():
-    """Summarize content from a webpage URL."""
+def get_webpage_input():
+    """
+    Read the URL from the JSON request and extract the webpage text.
+    Returns (text, url, None), or (None, None, error_response) when the input is unusable.
+    """
     data = request.get_json()
     if not data:
-        return jsonify({"error": "Invalid request. JSON payload expected."}), 400
+        return None, None, (jsonify({"error": "Invalid request. JSON payload expected."}), 400)
         
     url = data.get("url", "")
 
     if not url:
-        return jsonify({"error": "No URL provided"}), 400
+        return None, None, (jsonify({"error": "No URL provided"}), 400)
     
     if not (url.startswith("http://") or url.startswith("https://")):
-        return jsonify({"error": "Invalid URL format. Must start with http:// or https://"}), 400
+        return None, None, (jsonify({"error": "Invalid URL format. Must start with http:// or https://"}), 400)
 
     app.logger.info(f"Attempting to extract text from webpage: {url}")
     text, error_msg = extract_text_from_webpage(url)
     
     if error_msg: 
         app.logger.error(f"Failed to extract content from {url}: {error_msg}")
-        return jsonify({"error": error_msg}), 400 # Use specific error from extraction
+        return None, None, (jsonify({"error": error_msg}), 400) # Use specific error from extraction
     if not text or not text.strip():
         app.logger.warning(f"No text extracted from webpage or extracted text is empty: {url}")
-        return jsonify({"error": "No content found on the webpage or content could not be extracted."}), 400
+        return None, None, (jsonify({"error": "No content found on the webpage or content could not be extracted."}), 400)
+
+    if len(text) > MAX_SUMMARY_INPUT_LENGTH: 
+        app.logger.warning(f"Webpage text for summarization from {url} (length {len(text)}) exceeds limit {MAX_SUMMARY_INPUT_LENGTH}. Refusing it.")
+        return None, None, (jsonify({"error": input_too_long_message(len(text))}), 413)
+
+    return text, url, None
+
+
+@app.route("/summarize_webpage", methods=["POST"])
+def summarize_webpage():
+    """Summarize content from a webpage URL."""
+    text, url, error_response = get_webpage_input()
+    if error_response:
+        return error_response
 
-    if len(text) > MAX_TEXT_INPUT_LENGTH: 
-        app.logger.warning(f"Webpage text for summarization from {url} (length {len(text)}) exceeds limit {MAX_TEXT_INPUT_LENGTH}. Truncating.")
-        text = text[:MAX_TEXT_INPUT_LENGTH]
+    cache_key = make_cache_key(text, SUMMARY_MODEL, WEBPAGE_SUMMARY_SYSTEM_PROMPT)
+    cached_summary = summary_cache.get(cache_key)
+    if cached_summary is not None:
+        app.logger.info(f"Summary cache hit for webpage: {url}")
+        return jsonify({"summary": cached_summary, "cached": True})
 
-    if not openai.api_key:
+    if not OPENAI_API_KEY:
         app.logger.error("OpenAI API key not configured for webpage summarization.")
         return jsonify({"error": "Summarization service is not configured. Administrator intervention required."}), 503
         
     try:
         app.logger.info(f"Requesting summarization from OpenAI for webpage: {url} (text length: {len(text)}).")
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful AI that summarizes webpage content accurately and professionally and doesn't make it too short, make the summarization format like bullet points for each main idea"},
-                {"role": "user", "content": f"Please summarize the key information from the following webpage content:\n\n{text}"}
-            ],
-            timeout=30 
-        )
-        summary = response.choices[0].message.content.strip()
+        with metrics.stage("llm"):
+            if len(text) > MAX_TEXT_INPUT_LENGTH:
+                app.logger.info(f"Webpage text from {url} exceeds {MAX_TEXT_INPUT_LENGTH} characters. Using chunked summarization.")
+                summary = chunked_summarizer.summarize(text, WEBPAGE_SUMMARY_SYSTEM_PROMPT, summary_deadline())
+            else:
+                summary = request_chat_completion(WEBPAGE_SUMMARY_SYSTEM_PROMPT, WEBPAGE_SUMMARY_USER_PREFIX + text)
+        summary_cache.set(cache_key, summary)
         app.logger.info(f"Summarization successful for webpage: {url}")
         return jsonify({"summary": summary})
-    except openai.error.OpenAIError as e_openai:
+    except (openai.error.OpenAIError, OpenAIClientError) as e_openai:
         app.logger.error(f"OpenAI API error during webpage summarization for {url}: {e_openai}")
         return jsonify({"error": f"Summarization service error: {type(e_openai).__name__}. Please try again later."}), 503
+    except SummaryDeadlineExceeded:
+        app.logger.error(f"Summarization of webpage {url} ran out of its {SUMMARY_TIME_BUDGET:.0f}s budget.")
+        return jsonify({"error": SUMMARY_BUSY_MESSAGE}), 503
     except requests.exceptions.Timeout:
         app.logger.error(f"OpenAI API call timed out for webpage {url}.")
         return jsonify({"error": "Summarization service timed out. Please try again later."}), 504
@@ -389,11 +827,250 @@ def summarize_webpage():
         app.logger.error(f"Generic error during webpage summarization for {url}: {e}")
         return jsonify({"error": "An unexpected error occurred during webpage summarization."}), 500
 
+# --- Streaming Summarization (Server-Sent Events) ---
+def generate_summary_events(text, system_prompt, user_prefix, cache_key, source_description):
+    """
+    SSE generator: 'token' events carry reply fragments, 'done' carries the full summary,
+    'error' reports a failure; 'status' events and keep-alive comments are sent while long inputs
+    are map-reduced. If the client disconnects, the WSGI server closes this generator: pending
+    map-reduce calls are cancelled and the upstream OpenAI stream is closed with it.
+    """
+    yield ": stream opened\n\n"  # Flush headers immediately so the browser sees the first byte
+    fragments = None
+    completed = False
+    cancel = threading.Event()  # Stops the map-reduce calls not yet started if the client goes away
+    try:
+        if len(text) > MAX_TEXT_INPUT_LENGTH:
+            yield sse_event("status", {"message": "Summarizing document sections..."})
+            final_input = REDUCE_USER_PREFIX + (yield from reduce_partials_events(text, cancel))
+        else:
+            final_input = user_prefix + text
+
+        parts = []
+        fragments = stream_chat_completion(system_prompt, final_input)
+        for fragment in fragments:
+            parts.append(fragment)
+            yield sse_event("token", {"text": fragment})
+
+        summary = "".join(parts).strip()
+        summary_cache.set(cache_key, summary)
+        completed = True
+        app.logger.info(f"Streaming summarization successful for {source_description}.")
+        yield sse_event("done", {"summary": summary})
+    except (openai.error.OpenAIError, OpenAIClientError) as e_openai:
+        app.logger.error(f"OpenAI API error during streaming summarization for {source_description}: {e_openai}")
+        yield sse_event("error", {"error": f"Summarization service error: {type(e_openai).__name__}. Please try again later."})
+    except SummaryDeadlineExceeded:
+        app.logger.error(f"Streaming summarization for {source_description} ran out of its {SUMMARY_TIME_BUDGET:.0f}s budget.")
+        yield sse_event("error", {"error": SUMMARY_BUSY_MESSAGE})
+    except requests.exceptions.Timeout:
+        app.logger.error(f"OpenAI API call timed out for {source_description}.")
+        yield sse_event("error", {"error": "Summarization service timed out. Please try again later."})
+    except Exception as e:
+        app.logger.error(f"Generic error during streaming summarization for {source_description}: {e}")
+        yield sse_event("error", {"error": "An unexpected error occurred during summarization."})
+    finally:
+        cancel.set()
+        if fragments is not None:
+            fragments.close()
+        if not completed:
+            app.logger.info(f"Summary stream for {source_description} ended before completion.")
+
+def summary_event_response(text, system_prompt, user_prefix, source_description):
+    """Build the SSE response for a validated input, answering from the cache when possible."""
+    cache_key = make_cache_key(text, SUMMARY_MODEL, system_prompt)
+    cached_summary = summary_cache.get(cache_key)
+    if cached_summary is not None:
+        app.logger.info(f"Summary cache hit (streaming) for {source_description}.")
+        events = iter([sse_event("done", {"summary": cached_summary, "cached": True})])
+    else:
+        if not OPENAI_API_KEY:
+            app.logger.error("OpenAI API key not configured.")
+            return jsonify({"error": "Summarization service is not configured. Administrator intervention required."}), 503
+        app.logger.info(f"Streaming summarization from OpenAI for {source_description} (length: {len(text)} chars).")
+        events = generate_summary_events(text, system_prompt, user_prefix, cache_key, source_description)
+
+    return Response(events, mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/summarize/stream", methods=["POST"])
+def summarize_stream():
+    """Streaming variant of /summarize: relays the summary as Server-Sent Events."""
+    text_to_summarize, source_description, error_response = get_summarize_input()
+    if error_response:
+        return error_response
+    return summary_event_response(text_to_summarize, TEXT_SUMMARY_SYSTEM_PROMPT, TEXT_SUMMARY_USER_PREFIX,
+                                  f"content from {source_description}")
+
+@app.route("/summarize_webpage/stream", methods=["POST"])
+def summarize_webpage_stream():
+    """Streaming variant of /summarize_webpage: relays the summary as Server-Sent Events."""
+    text, url, error_response = get_webpage_input()
+    if error_response:
+        return error_response
+    return summary_event_response(text, WEBPAGE_SUMMARY_SYSTEM_PROMPT, WEBPAGE_SUMMARY_USER_PREFIX,
+                                  f"webpage: {url}")
+
+# --- Batch Summarization (NDJSON) ---
+def summarize_text(text, system_prompt, user_prefix):
+    """Summarize validated text through the summary cache; returns (summary, cached). OpenAI/requests errors propagate."""
+    cache_key = make_cache_key(text, SUMMARY_MODEL, system_prompt)
+    cached_summary = summary_cache.get(cache_key)
+    if cached_summary is not None:
+        return cached_summary, True
+    if len(text) > MAX_TEXT_INPUT_LENGTH:
+        summary = chunked_summarizer.summarize(text, system_prompt, summary_deadline())
+    else:
+        summary = request_chat_completion(system_prompt, user_prefix + text)
+    summary_cache.set(cache_key, summary)
+    return summary, False
+
+def get_batch_items():
+    """
+    Collect batch items from the request: JSON {"urls": [...]}, or a multipart form with
+    any number of "files" parts and "urls" fields (one URL per line).
+    Returns (items, None) with items as (type, source, stream) tuples, or (None, error_response).
+    """
+    items = []
+    if request.is_json:
+        data = request.get_json(silent=True)
+        urls = data.get("urls") if isinstance(data, dict) else None
+        if not isinstance(urls, list):
+            return None, (jsonify({"error": "Invalid request. JSON payload with a \"urls\" list expected."}), 400)
+        items.extend(("url", str(url).strip(), None) for url in urls)
+    else:
+        for field in request.form.getlist("urls"):
+            items.extend(("url", url.strip(), None) for url in field.splitlines() if url.strip())
+        for file in request.files.getlist("files"):
+            # Take over the spooled upload: the request closes its files when the view returns,
+            # before the streamed response has consumed them. generate_batch_results closes it instead.
+            stream, file.stream = file.stream, io.BytesIO()
+            items.append(("file", file.filename or "", stream))
+
+    if not items:
+        return None, (jsonify({"error": "No URLs or files provided."}), 400)
+    if len(items) > BATCH_MAX_ITEMS:
+        return None, (jsonify({"error": f"Too many items in one batch (limit {BATCH_MAX_ITEMS})."}), 413)
+    return items, None
+
+def summarize_batch_item(endpoint, index, item_type, source, stream):
+    """
+    Extract and summarize one batch item on a batch thread; its stages are recorded under endpoint.
+    Returns its result record; failures become an "error" field.
+    """
+    with metrics.endpoint(endpoint):
+        return _summarize_batch_item(index, item_type, source, stream)
+
+def _summarize_batch_item(index, item_type, source, stream):
+    record = {"index": index, "type": item_type, "source": source}
+    if item_type == "url":
+        if not (source.startswith("http://") or source.startswith("https://")):
+            record["error"] = "Invalid URL format. Must start with http:// or https://"
+            return record
+        text, error_msg = extract_text_from_webpage(source)
+        if error_msg:
+            record["error"] = error_msg
+            return record
+        system_prompt, user_prefix = WEBPAGE_SUMMARY_SYSTEM_PROMPT, WEBPAGE_SUMMARY_USER_PREFIX
+    else:
+        if not allowed_file(source):
+            record["error"] = "File type not allowed for summarization."
+            return record
+        metrics.record_upload(stream_size(stream))
+        text = extract_text_from_file(stream, source)
+        if text is None:
+            record["error"] = "Unable to extract text from the file. The file might be corrupted, password-protected, or in an unsupported format."
+            return record
+        system_prompt, user_prefix = TEXT_SUMMARY_SYSTEM_PROMPT, TEXT_SUMMARY_USER_PREFIX
+
+    if not text or not text.strip():
+        record["error"] = "No content found after extraction."
+        return record
+    if len(text) > MAX_SUMMARY_INPUT_LENGTH:
+        record["error"] = input_too_long_message(len(text))
+        return record
+
+    try:
+        with metrics.stage("llm"):
+            record["summary"], record["cached"] = summarize_text(text, system_prompt, user_prefix)
+    except (openai.error.OpenAIError, OpenAIClientError) as e_openai:
+        app.logger.error(f"OpenAI API error during batch summarization of {source}: {e_openai}")
+        record["error"] = f"Summarization service error: {type(e_openai).__name__}. Please try again later."
+    except SummaryDeadlineExceeded:
+        app.logger.error(f"Batch summarization of {source} ran out of its {SUMMARY_TIME_BUDGET:.0f}s budget.")
+        record["error"] = SUMMARY_BUSY_MESSAGE
+    except requests.exceptions.Timeout:
+        app.logger.error(f"OpenAI API call timed out for batch item {source}.")
+        record["error"] = "Summarization service timed out. Please try again later."
+    return record
+
+def generate_batch_results(items, endpoint):
+    """
+    NDJSON generator: one line per item in completion order, then a summary line.
+    Items are processed BATCH_CONCURRENCY at a time, so fetching, extraction and LLM calls overlap;
+    if the client disconnects, items not yet started are cancelled.
+    """
+    executor = ThreadPoolExecutor(max_workers=min(BATCH_CONCURRENCY, len(items)), thread_name_prefix="batch")
+    futures = {executor.submit(summarize_batch_item, endpoint, index, *item): index for index, item in enumerate(items)}
+    succeeded = failed = 0
+    try:
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as e:
+                index = futures[future]
+                app.logger.error(f"Unexpected error in batch item {index} ({items[index][1]}): {e}")
+                record = {"index": index, "type": items[index][0], "source": items[index][1],
+                          "error": "An unexpected error occurred during summarization."}
+            if "error" in record:
+                failed += 1
+            else:
+                succeeded += 1
+            yield json.dumps(record) + "\n"
+        yield json.dumps({"done": True, "total": len(items), "succeeded": succeeded, "failed": failed}) + "\n"
+    finally:
+        # Drop queued items (e.g. the client went away) and let running ones finish before their uploads are closed.
+        executor.shutdown(wait=True, cancel_futures=True)
+        for _, _, stream in items:
+            if stream is not None:
+                stream.close()
+        app.logger.info(f"Batch of {len(items)} items finished: {succeeded} succeeded, {failed} failed.")
+
+@app.route("/summarize_batch", methods=["POST"])
+def summarize_batch():
+    """
+    Summarize many URLs and/or files in one request.
+    Streams application/x-ndjson: {"index", "type", "source", "summary", "cached"} or {..., "error"}
+    per item as each completes, followed by {"done": true, "total", "succeeded", "failed"}.
+    """
+    items, error_response = get_batch_items()
+    if error_response:
+        return error_response
+    if not OPENAI_API_KEY:
+        app.logger.error("OpenAI API key not configured.")
+        return jsonify({"error": "Summarization service is not configured. Administrator intervention required."}), 503
+
+    app.logger.info(f"Starting batch summarization of {len(items)} items.")
+    return Response(generate_batch_results(items, request.endpoint), mimetype="application/x-ndjson",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# --- Start-up ---
+def warm_up():
+    """
+    Import the libraries that are otherwise loaded by the first request that needs them: the
+    document handlers' parsers and pdf2docx, the HTML extraction backend and openai. gunicorn.conf.py
+    calls this in the master when it preloads the app, so forked workers share them copy-on-write.
+    Returns the names of the libraries imported.
+    """
+    loaded = document_handlers.warm_up()
+    loaded.append(html_extraction.warm_up(HTML_EXTRACT_BACKEND))
+    openai.load()
+    loaded.append("openai")
+    return loaded
+
 # --- Main Execution ---
 if __name__ == "__main__":
     # For production, use a proper WSGI server (e.g., Gunicorn, uWSGI) instead of Flask's development server.
-    # Consider a robust strategy for cleaning up UPLOAD_FOLDER and CONVERTED_FOLDER in a production environment
-    # (e.g., a scheduled cron job or task queue worker).
     app.logger.info("Starting Flask development server.")
     # Use PORT environment variable if available (common for cloud platforms like Render)
     port = int(os.environ.get("PORT", 5000))
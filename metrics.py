@@ -0,0 +1,411 @@
+import atexit
+import bisect
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+# Default latency buckets in seconds (stages range from sub-millisecond parsing to multi-minute conversions)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTES_BUCKETS = (1024, 10 * 1024, 100 * 1024, 512 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2)
+CHARS_BUCKETS = (100, 1000, 10000, 50000, 100000, 500000, 1000000, 2000000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = None
+    suffix = ""
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _header(self, name=None):
+        name = name or self.name
+        return [f"# HELP {name} {self.documentation}", f"# TYPE {name} {self.type_name}"]
+
+    def collect(self):
+        """This process's values: {label values: value}."""
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, processes):
+        """Combine the collect() results of several processes, given as (values, alive) pairs."""
+        merged = {}
+        for values, _ in processes:
+            for key, value in values.items():
+                merged[key] = merged.get(key, 0) + value
+        return merged
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self, values=None):
+        values = self.collect() if values is None else values
+        lines = self._header(self.name + "_total")
+        for key, value in values.items():
+            lines.append(f"{self.name}_total{_format_labels(self.label_names, key)} {_format_number(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def collect(self):
+        with self._lock:
+            return {key: [list(counts), total, count] for key, (counts, total, count) in self._values.items()}
+
+    def merge(self, processes):
+        merged = {}
+        for values, _ in processes:
+            for key, (counts, total, count) in values.items():
+                state = merged.setdefault(key, [[0] * len(counts), 0.0, 0])
+                state[0] = [a + b for a, b in zip(state[0], counts)]
+                state[1] += total
+                state[2] += count
+        return merged
+
+    def render(self, values=None):
+        values = self.collect() if values is None else values
+        lines = self._header()
+        for key, (counts, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class CallbackGauge(_Metric):
+    """
+    Gauge whose value(s) are read from a callback at scrape time.
+    Across processes, mode "sum" adds up the values of live processes (per-process state, e.g. a
+    cache's entries); "max" takes the largest (state every process sees alike, e.g. a shared index).
+    """
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, callback, label_names=(), mode="sum"):
+        super().__init__(name, documentation, label_names)
+        self.callback = callback
+        self.mode = mode
+
+    def collect(self):
+        try:
+            values = self.callback()
+        except Exception:
+            return {}
+        if not isinstance(values, dict):
+            values = {(): values}
+        return {tuple(str(part) for part in (key if isinstance(key, tuple) else (key,))): value
+                for key, value in values.items()}
+
+    def merge(self, processes):
+        merged = {}
+        for values, alive in processes:
+            if not alive:
+                continue  # An exited process's gauges no longer describe anything
+            for key, value in values.items():
+                if key not in merged:
+                    merged[key] = value
+                elif self.mode == "max":
+                    merged[key] = max(merged[key], value)
+                else:
+                    merged[key] += value
+        return merged
+
+    def render(self, values=None):
+        values = self.collect() if values is None else values
+        name = self.name + self.suffix
+        lines = self._header(name)
+        for key, value in values.items():
+            lines.append(f"{name}{_format_labels(self.label_names, key)} {_format_number(value)}")
+        return lines
+
+
+class CallbackCounter(CallbackGauge):
+    """Counter maintained elsewhere (e.g. cache statistics) and read at scrape time."""
+    type_name = "counter"
+    suffix = "_total"
+
+    def merge(self, processes):
+        return _Metric.merge(self, processes)  # Counts of exited processes still add to the totals
+
+
+class Registry:
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, label_names=()):
+        return self._add(Counter(self.prefix + name, documentation, label_names))
+
+    def histogram(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(self.prefix + name, documentation, label_names, buckets))
+
+    def gauge_callback(self, name, documentation, callback, label_names=(), mode="sum"):
+        return self._add(CallbackGauge(self.prefix + name, documentation, callback, label_names, mode))
+
+    def counter_callback(self, name, documentation, callback, label_names=()):
+        return self._add(CallbackCounter(self.prefix + name, documentation, callback, label_names))
+
+    def collect(self):
+        return {metric.name: metric.collect() for metric in self._metrics}
+
+    def render(self, processes=None):
+        """
+        Text exposition of this process's metrics, or of several processes' merged:
+        processes is a list of (collect() result, alive) pairs.
+        """
+        lines = []
+        for metric in self._metrics:
+            if processes is None:
+                lines.extend(metric.render())
+            else:
+                lines.extend(metric.render(metric.merge([(values.get(metric.name, {}), alive)
+                                                         for values, alive in processes])))
+        return "\n".join(lines) + "\n"
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ProcessSnapshots:
+    """
+    Metrics of every worker process, shared through snapshot files in one directory, so that a scrape
+    answered by any worker reports the whole server. Each process rewrites its own file every `interval`
+    seconds, when it answers a scrape and when it exits. Files of exited processes are kept: their
+    counters and histograms still count towards the totals, their gauges are left out.
+    The directory should be emptied whenever the server (re)starts; gunicorn.conf.py does this.
+    """
+
+    def __init__(self, registry, directory, interval=5.0):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._pid = None
+        self._path = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start this process's writer thread; called on every request, a no-op once running in this process."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            # A token as well as the pid, so a later process reusing the pid doesn't overwrite these counts.
+            self._path = os.path.join(self.directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json")
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="metrics-snapshot", daemon=True).start()
+            atexit.register(self.write)
+
+    def _run(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.interval)
+            self.write()
+
+    def write(self):
+        if self._pid != os.getpid():
+            return
+        snapshot = {"pid": self._pid,
+                    "metrics": {name: [[list(key), value] for key, value in values.items()]
+                                for name, values in self.registry.collect().items()}}
+        temporary = f"{self._path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(temporary, self._path)
+        except OSError as e_write:
+            logger.error(f"Could not write metrics snapshot {self._path}: {e_write}")
+
+    def read(self):
+        """[(collect() result, alive)] for every process that has written a snapshot."""
+        processes = []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue  # Removed or replaced while listing
+            values = {name: {tuple(key): value for key, value in entries}
+                      for name, entries in snapshot["metrics"].items()}
+            processes.append((values, _process_alive(snapshot["pid"])))
+        return processes
+
+
+# --- Application metrics ---
+# Values are recorded per process; with several gunicorn workers, init_app(snapshot_dir=...) makes
+# /metrics report all of them together (see ProcessSnapshots).
+registry = Registry(prefix="aiapp_")
+
+http_requests = registry.counter("http_requests", "HTTP requests handled.", ("endpoint", "method", "status"))
+http_request_duration = registry.histogram("http_request_duration_seconds", "Time spent handling HTTP requests.", ("endpoint",))
+stage_duration = registry.histogram("stage_duration_seconds", "Time spent in each processing stage of a route.", ("endpoint", "stage"))
+openai_request_duration = registry.histogram("openai_request_duration_seconds", "Duration of OpenAI API calls.", ("mode",))
+openai_errors = registry.counter("openai_errors", "Failed OpenAI API calls by error type.", ("type",))
+uploaded_bytes = registry.histogram("uploaded_bytes", "Size of uploaded files.", ("endpoint",), BYTES_BUCKETS)
+conversion_dedup = registry.counter("conversion_dedup", "PDF conversion requests by deduplication outcome.", ("outcome",))
+extracted_chars = registry.histogram("extracted_characters", "Characters of text extracted per document.", ("source",), CHARS_BUCKETS)
+
+
+# Endpoint that work on a helper thread (e.g. a batch item) is attributed to; see endpoint().
+_thread_state = threading.local()
+
+
+def _current_endpoint():
+    if has_request_context():
+        return request.endpoint or "unknown"
+    return getattr(_thread_state, "endpoint", None) or "background"
+
+
+@contextmanager
+def endpoint(name):
+    """Attribute stages and uploads recorded on this thread outside a request context to endpoint name."""
+    previous = getattr(_thread_state, "endpoint", None)
+    _thread_state.endpoint = name
+    try:
+        yield
+    finally:
+        _thread_state.endpoint = previous
+
+
+@contextmanager
+def stage(name):
+    """Time a block as a named stage of the current route (histogram + Server-Timing entry)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_duration.observe(elapsed, endpoint=_current_endpoint(), stage=name)
+        if has_request_context():
+            g.setdefault("stage_timings", []).append((name, elapsed))
+
+
+def record_openai_error(error):
+    openai_errors.inc(type=type(error).__name__)
+
+
+def record_upload(num_bytes):
+    uploaded_bytes.observe(num_bytes, endpoint=_current_endpoint())
+
+
+def record_extracted(num_chars, source):
+    extracted_chars.observe(num_chars, source=source)
+
+
+def init_app(app, server_timing=False, snapshot_dir=None):
+    """
+    Install per-request timing hooks and the Prometheus /metrics endpoint.
+    With snapshot_dir, a directory shared by all worker processes, /metrics merges every worker's metrics.
+    """
+    snapshots = ProcessSnapshots(registry, snapshot_dir) if snapshot_dir else None
+
+    @app.before_request
+    def _start_request_timer():
+        g.request_started = time.perf_counter()
+        if snapshots is not None:
+            snapshots.start()
+
+    def _observe(endpoint_name, method, status, started):
+        http_requests.inc(endpoint=endpoint_name, method=method, status=status)
+        http_request_duration.observe(time.perf_counter() - started, endpoint=endpoint_name)
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop("request_started", None)
+        if started is None or request.endpoint == "metrics":
+            return response
+        endpoint_name = request.endpoint or "unknown"
+        if response.is_streamed:
+            # The body (SSE, NDJSON, file) is produced after this hook: count the request once the
+            # server has sent it and closes the response. Server-Timing can only cover the setup.
+            method, status = request.method, response.status_code
+            response.call_on_close(lambda: _observe(endpoint_name, method, status, started))
+            total_name = "setup"
+        else:
+            _observe(endpoint_name, request.method, response.status_code, started)
+            total_name = "total"
+        if server_timing:
+            elapsed = time.perf_counter() - started
+            entries = [f"{name};dur={duration * 1000:.1f}" for name, duration in g.get("stage_timings", [])]
+            entries.append(f"{total_name};dur={elapsed * 1000:.1f}")
+            response.headers.add("Server-Timing", ", ".join(entries))
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        """Prometheus text exposition of the server's metrics (this process's, without a snapshot directory)."""
+        if snapshots is None:
+            body = registry.render()
+        else:
+            snapshots.write()
+            body = registry.render(snapshots.read())
+        return Response(body, mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,374 @@
+import logging
+import random
+import threading
+import time
+
+import requests
+
+from chunked_summary import estimate_tokens
+from lazy_imports import LazyModule
+
+logger = logging.getLogger(__name__)
+
+# The openai package (with aiohttp and NumPy behind it) is imported by the first API call.
+openai = LazyModule("openai")
+
+
+class OpenAIClientError(Exception):
+    """
+    Raised by OpenAIClient without calling the API. Not an openai.error.OpenAIError, so that
+    defining it doesn't import openai; callers catch both.
+    """
+
+
+class CircuitOpenError(OpenAIClientError):
+    """Raised without calling the API while the circuit breaker is open."""
+
+
+class RateLimitTimeout(OpenAIClientError):
+    """Raised when the local rate limiter or concurrency cap can't admit a call within the wait budget."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: capacity tokens, refilled continuously at capacity per `period` seconds.
+    Callers are served in arrival order: acquire() debits the tokens at once, letting the balance go
+    negative, and each caller sleeps off the debt ahead of it, so a large request can't be starved
+    by a stream of small ones.
+    """
+
+    def __init__(self, capacity, period=60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1, deadline=None):
+        """
+        Take amount tokens, waiting until they have been refilled. Returns False, without taking
+        anything, if that wait would run past deadline (monotonic).
+        """
+        amount = min(float(amount), self.capacity)  # A single oversized request must still be admissible
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, (amount - self._tokens) / self.rate)
+            if deadline is not None and now + wait > deadline:
+                return False
+            self._tokens -= amount
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def adjust(self, amount):
+        """Give back (positive) or charge (negative) tokens once the real cost of a call is known."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+    def available(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    AIMD concurrency cap: halves (decrease_factor) when the API throttles us, then grows back by
+    one slot per `limit` successful calls. Decreases are spaced by `cooldown` seconds so one burst
+    of 429s counts once.
+    """
+
+    def __init__(self, maximum, minimum=1, decrease_factor=0.5, cooldown=1.0):
+        self.maximum = maximum
+        self.minimum = max(1, min(minimum, maximum))
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self._limit = float(maximum)
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def acquire(self, deadline=None):
+        """Wait for a free slot; returns False if none frees up before deadline (monotonic)."""
+        with self._cond:
+            while self._in_flight >= int(self._limit):
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    return False
+                self._cond.wait(timeout)
+            self._in_flight += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    def on_success(self):
+        with self._cond:
+            if self._limit < self.maximum:
+                grew = int(self._limit + 1.0 / self._limit) > int(self._limit)
+                self._limit = min(float(self.maximum), self._limit + 1.0 / self._limit)
+                if grew:
+                    self._cond.notify()
+
+    def on_throttle(self):
+        now = time.monotonic()
+        with self._cond:
+            if now - self._last_decrease >= self.cooldown:
+                self._limit = max(float(self.minimum), self._limit * self.decrease_factor)
+                self._last_decrease = now
+                logger.warning(f"OpenAI throttled us; concurrency limit lowered to {int(self._limit)}.")
+
+    def stats(self):
+        with self._cond:
+            return {"limit": int(self._limit), "in_flight": self._in_flight}
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and rejects calls for reset_timeout seconds,
+    then lets a single trial call through (half-open): success closes it, failure re-opens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("OpenAI circuit breaker closed.")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.error(f"OpenAI circuit breaker opened after {self._failures} consecutive failures.")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release_trial(self):
+        """Forget a half-open trial that ended without a verdict (e.g. a client error)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+def _classify(error):
+    """'throttle' for 429s worth retrying, 'unavailable' for outages/timeouts, None for errors a retry won't fix."""
+    if isinstance(error, openai.error.RateLimitError):
+        return None if error.code == "insufficient_quota" else "throttle"
+    if isinstance(error, (openai.error.Timeout, openai.error.APIConnectionError,
+                          openai.error.ServiceUnavailableError, openai.error.TryAgain,
+                          requests.exceptions.RequestException)):
+        return "unavailable"
+    if isinstance(error, openai.error.APIError) and (error.http_status or 500) >= 500:
+        return "unavailable"
+    return None
+
+
+def _retry_after(error):
+    headers = getattr(error, "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return max(float(value), 0.0) if value is not None else None
+    except ValueError:
+        return None
+
+
+class OpenAIClient:
+    """
+    The app's single entry point for chat completions.
+    - Token buckets for requests/minute and tokens/minute; a call reserves its estimated prompt
+      tokens plus reply_token_allowance, and the estimate is corrected from the reported usage.
+    - Retries throttling and outage errors with full-jitter exponential backoff, never sooner than
+      the server's Retry-After, within retry_budget seconds per call.
+    - An AIMD concurrency cap that shrinks on 429s and grows back as calls succeed.
+    - A circuit breaker that fails fast (CircuitOpenError) during outages.
+    Errors that survive retries are the usual openai.error exceptions; calls refused locally
+    raise OpenAIClientError subclasses.
+    api_key=None leaves the key to the openai package (OPENAI_API_KEY).
+    """
+
+    def __init__(self, model, api_key=None, requests_per_minute=3500, tokens_per_minute=90000, max_concurrency=16,
+                 min_concurrency=1, max_retries=4, backoff_base=0.5, backoff_max=20.0, retry_budget=60.0,
+                 timeout=30, breaker_threshold=5, breaker_reset=30.0, reply_token_allowance=500):
+        self.model = model
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_budget = retry_budget
+        self.timeout = timeout
+        self.reply_token_allowance = reply_token_allowance
+
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.concurrency = AdaptiveConcurrencyLimit(max_concurrency, min_concurrency)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "retries": 0, "throttled": 0, "rejected": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _messages(self, system_prompt, user_content):
+        return [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_content}]
+
+    def _backoff(self, attempt, error):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        retry_after = _retry_after(error)
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    def _admit(self, estimated_tokens, deadline):
+        """Breaker, rate limits and a concurrency slot; the caller must release the slot."""
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError("OpenAI is failing; not sending requests for a while.")
+        taken = []  # (bucket, amount) to give back if a later step refuses the call
+        for bucket, amount in ((self.request_bucket, 1), (self.token_bucket, estimated_tokens)):
+            if not bucket.acquire(amount, deadline):
+                break
+            taken.append((bucket, amount))
+        else:
+            if self.concurrency.acquire(deadline):
+                return
+        for bucket, amount in taken:
+            bucket.adjust(amount)
+        self.breaker.release_trial()
+        self._count("rejected")
+        raise RateLimitTimeout("Local OpenAI rate limit: no capacity within the wait budget.")
+
+    def _record_error(self, error):
+        kind = _classify(error)
+        if kind == "throttle":
+            self._count("throttled")
+            self.concurrency.on_throttle()
+            self.breaker.release_trial()  # Throttling means the API is up
+        elif kind == "unavailable":
+            self.breaker.record_failure()
+        else:
+            self.breaker.release_trial()
+        return kind
+
+    def _call(self, system_prompt, user_content, stream):
+        """Run one admitted API call with retries; returns (response, estimated_tokens) holding a concurrency slot."""
+        estimated_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_content) + self.reply_token_allowance
+        deadline = time.monotonic() + self.retry_budget
+        attempt = 0
+        while True:
+            self._admit(estimated_tokens, deadline)
+            self._count("calls")
+            try:
+                response = openai.ChatCompletion.create(
+                    model=self.model,
+                    api_key=self.api_key,
+                    messages=self._messages(system_prompt, user_content),
+                    timeout=self.timeout,
+                    stream=stream,
+                )
+                return response, estimated_tokens
+            except (openai.error.OpenAIError, requests.exceptions.RequestException) as e:
+                self.concurrency.release()
+                kind = self._record_error(e)
+                delay = self._backoff(attempt, e)
+                if kind is None or attempt >= self.max_retries or time.monotonic() + delay > deadline:
+                    raise
+                attempt += 1
+                self._count("retries")
+                logger.warning(f"OpenAI call failed ({type(e).__name__}); retry {attempt}/{self.max_retries} in {delay:.1f}s.")
+                time.sleep(delay)
+            except BaseException:
+                self.concurrency.release()
+                self.breaker.release_trial()
+                raise
+
+    def complete(self, system_prompt, user_content):
+        """Return the reply text of one chat completion."""
+        response, estimated_tokens = self._call(system_prompt, user_content, stream=False)
+        try:
+            usage = response.get("usage") or {}
+            if usage.get("total_tokens"):
+                self.token_bucket.adjust(estimated_tokens - usage["total_tokens"])
+            self.breaker.record_success()
+            self.concurrency.on_success()
+            return response.choices[0].message.content.strip()
+        finally:
+            self.concurrency.release()
+
+    def stream(self, system_prompt, user_content):
+        """
+        Yield reply fragments of a streaming chat completion. Retries happen only before the
+        stream opens; the concurrency slot is held until the generator finishes or is closed.
+        """
+        stream, _ = self._call(system_prompt, user_content, stream=True)
+        try:
+            for chunk in stream:
+                fragment = chunk.choices[0].delta.get("content") if chunk.choices else None
+                if fragment:
+                    yield fragment
+            self.breaker.record_success()
+            self.concurrency.on_success()
+        except (openai.error.OpenAIError, requests.exceptions.RequestException) as e:
+            self._record_error(e)
+            raise
+        finally:
+            self.concurrency.release()
+            self.breaker.release_trial()  # No verdict if the consumer went away mid-stream
+            # Drop the upstream connection as soon as our consumer goes away.
+            close_stream = getattr(stream, "close", None)
+            if close_stream:
+                close_stream()
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+        snapshot.update(self.concurrency.stats())
+        snapshot["breaker"] = self.breaker.state
+        snapshot["tokens_available"] = int(self.token_bucket.available())
+        return snapshot
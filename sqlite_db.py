@@ -0,0 +1,29 @@
+import contextlib
+import os
+import sqlite3
+
+
+@contextlib.contextmanager
+def connect(db_path, timeout=5):
+    """
+    Connection to db_path for one operation: `with connect(db_path) as conn:` commits on success,
+    rolls back on error and closes the connection either way.
+    """
+    # A short-lived connection per operation keeps this safe across threads and forked workers.
+    conn = sqlite3.connect(db_path, timeout=timeout)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+@contextlib.contextmanager
+def init_db(db_path):
+    """Create db_path's directory and switch the database to WAL; yields a connection (as connect does) for schema setup."""
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    with connect(db_path) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        yield conn
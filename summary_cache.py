@@ -0,0 +1,173 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import sqlite_db
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different copies of a document share a cache key."""
+    return " ".join((text or "").split())
+
+
+def make_cache_key(text, model, system_prompt):
+    """Content-addressed key: SHA-256 over model, system prompt and normalized text."""
+    digest = hashlib.sha256()
+    for part in (model, system_prompt, normalize_text(text)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")  # Separator so field boundaries can't collide
+    return digest.hexdigest()
+
+
+class SummaryCache:
+    """
+    Two-tier summary cache.
+    - Memory: bounded LRU (entry count and total characters), per-entry TTL.
+    - Disk (optional): SQLite file that survives restarts, same TTL, bounded row count.
+    A disk hit is promoted back into the memory tier.
+    """
+
+    def __init__(self, max_entries=256, max_chars=2_000_000, ttl_seconds=24 * 3600,
+                 db_path=None, max_db_entries=10000):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.max_db_entries = max_db_entries
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (summary, stored_at)
+        self._chars = 0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+        if self.db_path:
+            try:
+                self._init_db()
+            except sqlite3.Error as e_db:
+                logger.error(f"Summary cache disk tier disabled, cannot open {self.db_path}: {e_db}")
+                self.db_path = None
+
+    # --- Disk tier ---
+    def _connect(self):
+        return sqlite_db.connect(self.db_path)
+
+    def _init_db(self):
+        with sqlite_db.init_db(self.db_path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                " key TEXT PRIMARY KEY, summary TEXT NOT NULL,"
+                " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_accessed ON summaries (accessed_at)")
+
+    def _db_get(self, key, now):
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT summary, created_at FROM summaries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                summary, created_at = row
+                if now - created_at > self.ttl_seconds:
+                    conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                    return None
+                conn.execute("UPDATE summaries SET accessed_at = ? WHERE key = ?", (now, key))
+                return summary, created_at
+        except sqlite3.Error as e_db:
+            logger.error(f"Summary cache disk read failed: {e_db}")
+            return None
+
+    def _db_set(self, key, summary, now):
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO summaries (key, summary, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, summary, now, now),
+                )
+                conn.execute("DELETE FROM summaries WHERE created_at < ?", (now - self.ttl_seconds,))
+                # Size-based eviction: keep only the most recently accessed rows.
+                conn.execute(
+                    "DELETE FROM summaries WHERE key IN ("
+                    " SELECT key FROM summaries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_db_entries,),
+                )
+        except sqlite3.Error as e_db:
+            logger.error(f"Summary cache disk write failed: {e_db}")
+
+    # --- Memory tier ---
+    def _memory_put(self, key, summary, stored_at):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._chars -= len(old[0])
+        self._entries[key] = (summary, stored_at)
+        self._chars += len(summary)
+        while self._entries and (len(self._entries) > self.max_entries or self._chars > self.max_chars):
+            _, (evicted_summary, _) = self._entries.popitem(last=False)
+            self._chars -= len(evicted_summary)
+            self._stats["evictions"] += 1
+
+    # --- Public API ---
+    def get(self, key):
+        """Return the cached summary for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                summary, stored_at = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return summary
+                del self._entries[key]
+                self._chars -= len(summary)
+                self._stats["expired"] += 1
+
+        if self.db_path:
+            found = self._db_get(key, now)
+            if found is not None:
+                summary, created_at = found
+                with self._lock:
+                    self._memory_put(key, summary, created_at)
+                    self._stats["disk_hits"] += 1
+                return summary
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, key, summary):
+        """Store a summary in both tiers."""
+        if not summary:
+            return
+        now = time.time()
+        with self._lock:
+            self._memory_put(key, summary, now)
+            self._stats["stores"] += 1
+        if self.db_path:
+            self._db_set(key, summary, now)
+
+    def stats(self):
+        """Snapshot of hit/miss counters and current memory-tier size."""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["entries"] = len(self._entries)
+            snapshot["chars"] = self._chars
+        lookups = snapshot["memory_hits"] + snapshot["disk_hits"] + snapshot["misses"]
+        snapshot["hit_ratio"] = round((snapshot["memory_hits"] + snapshot["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return snapshot
+
+    def clear(self):
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._entries.clear()
+            self._chars = 0
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM summaries")
+            except sqlite3.Error as e_db:
+                logger.error(f"Summary cache disk clear failed: {e_db}")
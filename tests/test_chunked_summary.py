@@ -0,0 +1,43 @@
+import threading
+
+import pytest
+
+from chunked_summary import ChunkedSummarizer, SummaryCancelled
+
+
+class DictCache:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+TEXT = " ".join(f"Sentence {i} about topic {i % 97}." for i in range(3000))
+
+
+def test_progress_reports_each_call():
+    summarizer = ChunkedSummarizer(lambda system, content: "summary", DictCache(), "model", chunk_tokens=500)
+    reports = []
+    summarizer.reduce_partials(TEXT, progress=lambda level, done, total: reports.append((level, done, total)))
+    total = reports[0][2]
+    assert total > 1
+    assert reports == [(0, done, total) for done in range(1, total + 1)]
+
+
+def test_cancel_stops_calls_not_yet_started():
+    cancel = threading.Event()
+    calls = []
+
+    def complete(system, content):
+        calls.append(content)
+        cancel.set()
+        return "summary"
+
+    summarizer = ChunkedSummarizer(complete, DictCache(), "model", chunk_tokens=500, max_workers=2)
+    with pytest.raises(SummaryCancelled):
+        summarizer.reduce_partials(TEXT, cancel=cancel)
+    assert len(calls) <= 2
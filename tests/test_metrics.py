@@ -0,0 +1,33 @@
+from metrics import ProcessSnapshots, Registry
+
+
+def _registry(gauge_value=1, shared_value=1):
+    registry = Registry(prefix="t_")
+    registry.counter("requests", "Requests.", ("endpoint",)).inc(endpoint="index")
+    registry.histogram("latency_seconds", "Latency.", buckets=(1,)).observe(0.5)
+    registry.gauge_callback("entries", "Per-process entries.", lambda: gauge_value)
+    registry.gauge_callback("files", "Shared files.", lambda: shared_value, mode="max")
+    registry.counter_callback("hits", "Hits.", lambda: {"memory": 2}, ("kind",))
+    return registry
+
+
+def test_render_merges_processes():
+    registry = _registry()
+    processes = [(_registry(3, 5).collect(), True), (_registry(4, 5).collect(), True), (_registry(7, 9).collect(), False)]
+    lines = registry.render(processes).splitlines()
+    assert 't_requests_total{endpoint="index"} 3' in lines  # Exited processes' counts still count
+    assert 't_latency_seconds_count 3' in lines
+    assert 't_latency_seconds_bucket{le="1"} 3' in lines
+    assert 't_hits_total{kind="memory"} 6' in lines
+    assert 't_entries 7' in lines  # Gauges: live processes only
+    assert 't_files 5' in lines
+
+
+def test_snapshots_round_trip(tmp_path):
+    registry = _registry(2, 3)
+    snapshots = ProcessSnapshots(registry, str(tmp_path), interval=3600)
+    snapshots.start()
+    snapshots.write()
+    processes = snapshots.read()
+    assert len(processes) == 1 and processes[0][1]
+    assert registry.render(processes) == registry.render()
@@ -0,0 +1,158 @@
+import threading
+import time
+
+import pytest
+
+from openai_client import AdaptiveConcurrencyLimit, CircuitBreaker, OpenAIClient, RateLimitTimeout, TokenBucket
+
+
+# --- TokenBucket ---
+def test_bucket_grants_capacity_without_waiting():
+    bucket = TokenBucket(10, period=1.0)
+    started = time.monotonic()
+    for _ in range(10):
+        assert bucket.acquire(1)
+    assert time.monotonic() - started < 0.05
+
+
+def test_bucket_waits_for_refill():
+    bucket = TokenBucket(10, period=1.0)  # 10 tokens per second
+    assert bucket.acquire(10)
+    started = time.monotonic()
+    assert bucket.acquire(2)
+    assert 0.15 <= time.monotonic() - started < 0.4
+
+
+def test_bucket_refuses_past_deadline_without_taking_tokens():
+    bucket = TokenBucket(10, period=1.0)
+    assert bucket.acquire(8)
+    assert not bucket.acquire(5, deadline=time.monotonic() + 0.1)
+    assert bucket.available() == pytest.approx(2, abs=0.5)
+
+
+def test_bucket_caps_oversized_requests_at_capacity():
+    bucket = TokenBucket(10, period=1.0)
+    assert bucket.acquire(1000, deadline=time.monotonic() + 0.01)
+
+
+def test_bucket_serves_waiters_in_arrival_order():
+    # A large request must not be starved by small ones arriving after it.
+    bucket = TokenBucket(10, period=0.5)  # 20 tokens per second
+    assert bucket.acquire(10)
+    finished = {}
+    stop = threading.Event()
+
+    def large():
+        started = time.monotonic()
+        bucket.acquire(10)
+        finished["large"] = time.monotonic() - started
+
+    def small():
+        while not stop.is_set():
+            bucket.acquire(1)
+
+    large_thread = threading.Thread(target=large)
+    large_thread.start()
+    time.sleep(0.01)
+    small_threads = [threading.Thread(target=small) for _ in range(4)]
+    for thread in small_threads:
+        thread.start()
+    large_thread.join(timeout=2)
+    stop.set()
+    for thread in small_threads:
+        thread.join(timeout=2)
+    assert finished["large"] < 0.8
+
+
+def test_bucket_adjust_gives_back_up_to_capacity():
+    bucket = TokenBucket(10, period=1000.0)
+    assert bucket.acquire(6)
+    bucket.adjust(4)
+    assert bucket.available() == pytest.approx(8, abs=0.1)
+    bucket.adjust(100)
+    assert bucket.available() == pytest.approx(10)
+
+
+# --- AdaptiveConcurrencyLimit ---
+def test_concurrency_limit_blocks_until_release():
+    limit = AdaptiveConcurrencyLimit(2)
+    assert limit.acquire() and limit.acquire()
+    assert not limit.acquire(deadline=time.monotonic() + 0.05)
+    threading.Timer(0.05, limit.release).start()
+    assert limit.acquire(deadline=time.monotonic() + 1)
+    assert limit.stats() == {"limit": 2, "in_flight": 2}
+
+
+def test_concurrency_limit_halves_on_throttle_once_per_cooldown():
+    limit = AdaptiveConcurrencyLimit(16, cooldown=60)
+    limit.on_throttle()
+    limit.on_throttle()
+    assert limit.limit == 8
+
+
+def test_concurrency_limit_grows_back_on_success():
+    limit = AdaptiveConcurrencyLimit(4, cooldown=0)
+    limit.on_throttle()
+    assert limit.limit == 2
+    for _ in range(20):
+        limit.on_success()
+    assert limit.limit == 4
+
+
+def test_concurrency_limit_keeps_minimum():
+    limit = AdaptiveConcurrencyLimit(4, minimum=2, cooldown=0)
+    for _ in range(5):
+        limit.on_throttle()
+    assert limit.limit == 2
+
+
+# --- CircuitBreaker ---
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_half_open_admits_one_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release_trial()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_failed_trial_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+# --- OpenAIClient admission ---
+def test_admit_gives_back_rate_limit_tokens_when_no_slot_frees_up():
+    client = OpenAIClient("model", requests_per_minute=100, tokens_per_minute=10000, max_concurrency=1)
+    client._admit(1000, time.monotonic() + 1)
+    with pytest.raises(RateLimitTimeout):
+        client._admit(1000, time.monotonic() + 0.05)
+    assert client.request_bucket.available() == pytest.approx(99, abs=0.1)
+    assert client.token_bucket.available() == pytest.approx(9000, abs=20)
+    assert client.stats()["rejected"] == 1
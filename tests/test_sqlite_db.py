@@ -0,0 +1,30 @@
+import sqlite3
+
+import pytest
+
+import sqlite_db
+
+
+def test_connection_commits_and_closes(tmp_path):
+    path = str(tmp_path / "db" / "index.db")
+    with sqlite_db.init_db(path) as conn:
+        conn.execute("CREATE TABLE items (name TEXT)")
+    with sqlite_db.connect(path) as conn:
+        conn.execute("INSERT INTO items VALUES ('a')")
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")  # Closed on leaving the block
+    with sqlite_db.connect(path) as conn:
+        assert conn.execute("SELECT name FROM items").fetchall() == [("a",)]
+        assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+
+
+def test_connection_rolls_back_on_error(tmp_path):
+    path = str(tmp_path / "index.db")
+    with sqlite_db.init_db(path) as conn:
+        conn.execute("CREATE TABLE items (name TEXT)")
+    with pytest.raises(RuntimeError):
+        with sqlite_db.connect(path) as conn:
+            conn.execute("INSERT INTO items VALUES ('a')")
+            raise RuntimeError("failed mid-operation")
+    with sqlite_db.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone() == (0,)
@@ -0,0 +1,172 @@
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from jobs import POOL_CONTEXT
+
+# PyPDF2 and python-docx are imported inside the functions that use them, so they are loaded
+# by the first document of their type rather than at start-up (see document_handlers).
+
+logger = logging.getLogger(__name__)
+
+# Pages handed to one worker at a time; small enough to stream, large enough to amortise re-opening the PDF.
+PDF_PAGES_PER_TASK = 8
+# Markup-compatibility fallback content (e.g. the VML copy of a text box), which repeats its mc:Choice sibling.
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+_pool_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+
+
+def get_extraction_pool(max_workers=None):
+    """
+    Shared process pool for page extraction, created lazily. It is re-created after a fork, and after
+    one of its workers died (a crashed pool rejects every later submit with BrokenProcessPool).
+    Its processes come from a fork server (see jobs.POOL_CONTEXT).
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid() and _pool._broken:
+            logger.error("PDF extraction worker process died; restarting the extraction pool.")
+            _pool.shutdown(wait=False)
+            _pool = None
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1, mp_context=POOL_CONTEXT)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _open_document(source):
+    """
+    Normalise a document source for PdfReader/Document: a path, raw bytes or a binary file object.
+    File objects are rewound; bytes are wrapped in a BytesIO.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    if hasattr(source, "read"):
+        source.seek(0)
+    return source
+
+
+def _source_name(source):
+    return source if isinstance(source, str) else "<in-memory document>"
+
+
+def _extract_page_range(path, start, end):
+    """Worker: extract text for pages [start, end) of the PDF at path. Empty pages come back as ''."""
+    from PyPDF2 import PdfReader
+
+    return _page_texts(PdfReader(path), start, end)
+
+
+def _page_texts(reader, start, end):
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def iter_pdf_pages(source, max_pages=None, deadline=None, executor=None, pages_per_task=PDF_PAGES_PER_TASK):
+    """
+    Yield page texts of a PDF in page order.
+    - source: a path, PDF bytes or a binary file object (e.g. an upload's SpooledTemporaryFile).
+    - max_pages: page budget (None = whole document).
+    - deadline: absolute time.monotonic() value; pages not ready by then are dropped.
+    - executor: a process pool to spread page ranges over; None (or a pool of one worker, which
+      would only add the cost of re-opening the PDF per task) extracts inline.
+      Workers open the PDF by path: bytes and file objects are written to one temporary file first.
+      Page ranges lost to a crashed worker (BrokenProcessPool) are extracted inline instead.
+    Raises PyPDF2 errors for unreadable documents, like PdfReader itself.
+    """
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(_open_document(source))
+    total_pages = len(reader.pages)
+    if max_pages is not None:
+        total_pages = min(total_pages, max_pages)
+
+    if executor is None or getattr(executor, "_max_workers", 2) <= 1 or total_pages <= pages_per_task:
+        for i in range(total_pages):
+            if deadline is not None and time.monotonic() > deadline:
+                logger.warning(f"PDF extraction deadline reached for {_source_name(source)} after {i}/{total_pages} pages.")
+                return
+            yield reader.pages[i].extract_text() or ""
+        return
+
+    path, spilled = source, None
+    if not isinstance(source, str):
+        document = _open_document(source)
+        document.seek(0)
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as spilled:
+            while block := document.read(1024 * 1024):
+                spilled.write(block)
+        path = spilled.name
+    ranges = [(start, min(start + pages_per_task, total_pages)) for start in range(0, total_pages, pages_per_task)]
+    futures = []
+    try:
+        for start, end in ranges:
+            try:
+                futures.append(executor.submit(_extract_page_range, path, start, end))
+            except BrokenProcessPool:
+                futures.append(None)
+        for (start, end), future in zip(ranges, futures):
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                if future is None:
+                    raise BrokenProcessPool("not submitted")
+                page_texts = future.result(timeout=timeout)
+            except FutureTimeoutError:
+                logger.warning(f"PDF extraction deadline reached for {_source_name(source)} after {start}/{total_pages} pages.")
+                return
+            except BrokenProcessPool:
+                if deadline is not None and time.monotonic() > deadline:
+                    logger.warning(f"PDF extraction deadline reached for {_source_name(source)} after {start}/{total_pages} pages.")
+                    return
+                logger.warning(f"PDF extraction pool is broken; extracting pages {start}-{end} of {_source_name(source)} inline.")
+                page_texts = _page_texts(reader, start, end)
+            yield from page_texts
+    finally:
+        for future in futures:
+            if future is not None:
+                future.cancel()
+        if spilled is not None:
+            os.remove(spilled.name)  # Ranges still in flight are no longer wanted
+
+
+def extract_pdf_text(source, max_pages=None, deadline_seconds=None, executor=None):
+    """Full PDF text (newline-joined pages) within the page budget and deadline."""
+    deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+    return "\n".join(page for page in iter_pdf_pages(source, max_pages, deadline, executor) if page)
+
+
+def iter_docx_paragraphs(source, max_chars=None):
+    """
+    Yield paragraph texts of a DOCX (path, bytes or binary file object) in document order,
+    stopping once max_chars have been produced. Walks the body lazily instead of materialising doc.paragraphs.
+    Unlike doc.paragraphs this includes paragraphs nested in tables and text boxes; a text box's
+    mc:Fallback copy is skipped so its text appears once.
+    """
+    from docx import Document
+    from docx.oxml.ns import qn
+    from docx.text.paragraph import Paragraph
+
+    doc = Document(_open_document(source))
+    produced = 0
+    for element in doc.element.body.iter(qn("w:p")):
+        if next(element.iterancestors(MC_FALLBACK), None) is not None:
+            continue
+        text = Paragraph(element, doc).text
+        if max_chars is not None and produced + len(text) > max_chars:
+            remaining = max_chars - produced
+            if remaining > 0:
+                yield text[:remaining]
+            return
+        produced += len(text) + 1  # Account for the joining newline
+        yield text
+
+
+def extract_docx_text(source, max_chars=None):
+    return "\n".join(iter_docx_paragraphs(source, max_chars))
@@ -0,0 +1,195 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.compat import chardet
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+_MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+
+
+class ResponseTooLarge(requests.exceptions.RequestException):
+    """The response body exceeded the fetcher's byte ceiling."""
+
+
+class FetchResult:
+    """A downloaded page body plus the metadata needed to decode and revalidate it."""
+
+    def __init__(self, url, content, headers, from_cache=False):
+        self.url = url
+        self.content = content
+        self.headers = headers
+        self.from_cache = from_cache
+
+    @property
+    def encoding(self):
+        # Trust an explicit charset; otherwise sniff the body like requests' apparent_encoding.
+        content_type = self.headers.get("Content-Type", "")
+        if "charset" in content_type.lower():
+            return get_encoding_from_headers(self.headers) or "utf-8"
+        return chardet.detect(self.content)["encoding"] or "utf-8"
+
+    @property
+    def text(self):
+        try:
+            return self.content.decode(self.encoding, errors="replace")
+        except LookupError:
+            return self.content.decode("utf-8", errors="replace")
+
+
+class TTLCache:
+    """Thread-safe LRU with per-entry TTL, bounded by entry count and total size."""
+
+    def __init__(self, max_entries, ttl_seconds, max_size=None, sizeof=len):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, stored_at, size)
+        self._size = 0
+
+    def get(self, key, allow_stale=False):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at, _ = entry
+            if not allow_stale and time.time() - stored_at > self.ttl_seconds:
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        if self.max_size is not None and size > self.max_size:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[2]
+            self._entries[key] = (value, time.time(), size)
+            self._size += size
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or (self.max_size is not None and self._size > self.max_size)):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def touch(self, key):
+        """Reset an entry's age (e.g. after a 304 revalidation)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], time.time(), entry[2])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+def _freshness_lifetime(headers):
+    """Seconds a response may be reused without revalidation (Cache-Control max-age / Expires)."""
+    cache_control = headers.get("Cache-Control", "").lower()
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0
+    match = _MAX_AGE_PATTERN.search(cache_control)
+    if match:
+        return int(match.group(1))
+    if headers.get("Expires") and headers.get("Date"):
+        try:
+            return max((parsedate_to_datetime(headers["Expires"]) - parsedate_to_datetime(headers["Date"])).total_seconds(), 0)
+        except (TypeError, ValueError):
+            return 0
+    return 0
+
+
+class WebpageFetcher:
+    """
+    Shared HTTP client for webpage summarization.
+    - One requests.Session with a per-host keep-alive connection pool.
+    - Bodies are streamed and aborted past max_bytes.
+    - An HTTP cache keeps bodies with their validators: fresh entries (max-age/Expires) are
+      served directly, stale ones are revalidated with If-None-Match / If-Modified-Since.
+    - A separate TTL cache holds extracted text per URL (see get_text / set_text).
+    """
+
+    def __init__(self, timeout=15, max_bytes=5 * 1024 * 1024, pool_connections=10, pool_maxsize=10,
+                 http_cache_bytes=50 * 1024 * 1024, http_cache_entries=512, http_cache_ttl=24 * 3600,
+                 text_cache_ttl=600, text_cache_entries=512, user_agent=DEFAULT_USER_AGENT):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"User-Agent": user_agent})
+
+        self.http_cache = TTLCache(http_cache_entries, http_cache_ttl, max_size=http_cache_bytes,
+                                   sizeof=lambda entry: len(entry["content"]))
+        self.text_cache = TTLCache(text_cache_entries, text_cache_ttl)
+
+    def _download(self, response):
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > self.max_bytes:
+            raise ResponseTooLarge(f"Content-Length {declared} exceeds limit of {self.max_bytes} bytes.")
+        body = bytearray()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            body.extend(chunk)
+            if len(body) > self.max_bytes:
+                raise ResponseTooLarge(f"Response body exceeds limit of {self.max_bytes} bytes.")
+        return bytes(body)
+
+    def fetch(self, url):
+        """Return a FetchResult for url. Raises requests exceptions (including ResponseTooLarge)."""
+        cached = self.http_cache.get(url, allow_stale=True)
+        if cached is not None and time.time() < cached["fresh_until"]:
+            return FetchResult(url, cached["content"], cached["headers"], from_cache=True)
+
+        request_headers = {}
+        if cached is not None:
+            if cached["headers"].get("ETag"):
+                request_headers["If-None-Match"] = cached["headers"]["ETag"]
+            if cached["headers"].get("Last-Modified"):
+                request_headers["If-Modified-Since"] = cached["headers"]["Last-Modified"]
+
+        with self.session.get(url, headers=request_headers, timeout=self.timeout, stream=True) as response:
+            if response.status_code == 304 and cached is not None:
+                logger.info(f"Webpage not modified, reusing cached body: {url}")
+                cached["fresh_until"] = time.time() + _freshness_lifetime(response.headers)
+                self.http_cache.touch(url)
+                return FetchResult(url, cached["content"], cached["headers"], from_cache=True)
+            response.raise_for_status()
+            content = self._download(response)
+            headers = CaseInsensitiveDict(response.headers)
+
+        if "no-store" not in headers.get("Cache-Control", "").lower() and (
+                headers.get("ETag") or headers.get("Last-Modified") or _freshness_lifetime(headers)):
+            self.http_cache.set(url, {
+                "content": content,
+                "headers": headers,
+                "fresh_until": time.time() + _freshness_lifetime(headers),
+            })
+        return FetchResult(url, content, headers)
+
+    def get_text(self, url):
+        """Previously extracted text for url, or None if absent/expired."""
+        return self.text_cache.get(url)
+
+    def set_text(self, url, text):
+        self.text_cache.set(url, text)
+
+    def clear(self):
+        self.http_cache.clear()
+        self.text_cache.clear()